@@ -3,10 +3,11 @@ Caching framework.
 """
 __version__ = "0.4.5"
 
+import inspect
 from functools import wraps
 from importlib import import_module
 from types import FunctionType
-from typing import Callable, List, Optional, cast, Type, TypeVar
+from typing import Any, Callable, List, Optional, cast, Type, TypeVar
 
 from .backends.base import BaseCache, CacheFunctionType
 from .config import DefaultConfig
@@ -34,7 +35,7 @@ def _create_cache(
     if not isinstance(expire, int) or expire < -1:
         raise TypeError("Expected expire to larger equal than -1")
 
-    return backend_cls(  # type: ignore
+    backend = backend_cls(  # type: ignore
         cached_function=cached_function,
         expire=expire,
         limit=limit,
@@ -43,6 +44,8 @@ def _create_cache(
         cache_key_prefix=cache_key_prefix,
         **kwargs,
     )
+    backend.instrument()
+    return backend
 
 
 CacheDecoratorType = Callable[[FunctionType], CacheFunctionType]
@@ -106,21 +109,52 @@ def cache(
             **kwargs,
         )
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return cache(*args, **kwargs)
-
-        def cache_clear(*args, **kwargs) -> int:
-            """Clear the cache and cache statistics"""
-            if not strict and (args or kwargs):
-                raise UnsupportedError("fast hash not support pattern delete")
-
-            return sum(
-                [
-                    cache.cache_clear(args, kwargs),
-                    CacheDependency.dependent_cache_clear(cache, args, kwargs),
-                ]
-            )
+        cache_clear: Callable[..., Any]
+        if inspect.iscoroutinefunction(cache.get):
+
+            get = cache.get
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await get(*args, **kwargs)
+
+            async def cache_clear(*args, **kwargs) -> int:
+                """Clear the cache and cache statistics"""
+                if not strict and (args or kwargs):
+                    raise UnsupportedError("fast hash not support pattern delete")
+                if not (args or kwargs):
+                    cache.stats.reset()
+
+                return sum(
+                    [
+                        await cache.cache_clear(args, kwargs),
+                        await CacheDependency.async_dependent_cache_clear(
+                            cache, args, kwargs
+                        ),
+                    ]
+                )
+
+        else:
+
+            get = cache.get
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return get(*args, **kwargs)
+
+            def cache_clear(*args, **kwargs) -> int:
+                """Clear the cache and cache statistics"""
+                if not strict and (args or kwargs):
+                    raise UnsupportedError("fast hash not support pattern delete")
+                if not (args or kwargs):
+                    cache.stats.reset()
+
+                return sum(
+                    [
+                        cache.cache_clear(args, kwargs),
+                        CacheDependency.dependent_cache_clear(cache, args, kwargs),
+                    ]
+                )
 
         for item in dependency:
             item.cache_objects.add(cache)
@@ -128,6 +162,8 @@ def cache(
 
         wrapper.cache = cache  # type: ignore
         wrapper.cache_clear = cache_clear  # type: ignore
+        wrapper.cache_get_many = cache.get_many  # type: ignore
+        wrapper.cache_info = cache.cache_info  # type: ignore
         return wrapper
 
     if callable(limit):
@@ -326,3 +362,89 @@ def property_pickle_cache(
         cache_key_prefix=cache_key_prefix,
         **kwargs,
     )
+
+
+def async_json_cache(
+    limit: Optional[int] = None,
+    *,
+    expire: Optional[int] = None,
+    is_method: bool = False,
+    strict: bool = False,
+    dependency: Optional[List[CacheDependency]] = None,
+    cache_key_prefix: str = "",
+    **kwargs,
+) -> CacheDecoratorType:
+    return cache(
+        limit=limit,
+        expire=expire,
+        is_method=is_method,
+        strict=strict,
+        backend=DefaultConfig.get_current_config().CACHE_ALCHEMY_ASYNC_JSON_BACKEND,
+        dependency=dependency or [],
+        cache_key_prefix=cache_key_prefix,
+        **kwargs,
+    )
+
+
+def method_async_json_cache(
+    limit: Optional[int] = None,
+    *,
+    expire: Optional[int] = None,
+    strict: bool = False,
+    dependency: Optional[List[CacheDependency]] = None,
+    cache_key_prefix: str = "",
+    **kwargs,
+) -> CacheDecoratorType:
+    return cache(
+        limit=limit,
+        expire=expire,
+        is_method=True,
+        strict=strict,
+        backend=DefaultConfig.get_current_config().CACHE_ALCHEMY_ASYNC_JSON_BACKEND,
+        dependency=dependency or [],
+        cache_key_prefix=cache_key_prefix,
+        **kwargs,
+    )
+
+
+def async_pickle_cache(
+    limit: Optional[int] = None,
+    *,
+    expire: Optional[int] = None,
+    is_method: bool = False,
+    strict: bool = False,
+    dependency: Optional[List[CacheDependency]] = None,
+    cache_key_prefix: str = "",
+    **kwargs,
+) -> CacheDecoratorType:
+    return cache(
+        limit=limit,
+        expire=expire,
+        is_method=is_method,
+        strict=strict,
+        backend=DefaultConfig.get_current_config().CACHE_ALCHEMY_ASYNC_PICKLE_BACKEND,
+        dependency=dependency or [],
+        cache_key_prefix=cache_key_prefix,
+        **kwargs,
+    )
+
+
+def method_async_pickle_cache(
+    limit: Optional[int] = None,
+    *,
+    expire: Optional[int] = None,
+    strict: bool = False,
+    dependency: Optional[List[CacheDependency]] = None,
+    cache_key_prefix: str = "",
+    **kwargs,
+) -> CacheDecoratorType:
+    return cache(
+        limit=limit,
+        expire=expire,
+        is_method=True,
+        strict=strict,
+        backend=DefaultConfig.get_current_config().CACHE_ALCHEMY_ASYNC_PICKLE_BACKEND,
+        dependency=dependency or [],
+        cache_key_prefix=cache_key_prefix,
+        **kwargs,
+    )
@@ -1,29 +1,84 @@
+import asyncio
+import inspect
+import logging
+import math
+import random
 import re
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
 from types import FunctionType
 from typing import (
     Any,
     ContextManager,
     Dict,
+    Hashable,
+    Iterable,
+    List,
+    Sequence,
     Tuple,
+    Type,
+    Union,
     cast,
     Pattern,
 )
 from typing import Callable, TypeVar, Optional, Set, Generic
+from uuid import uuid4
 
+from .. import events
+from ..compression import Compressor, compress, decompress, get_compressor
+from ..envelope import (
+    ERROR_TAG,
+    CachedError,
+    Envelope,
+    dump_error,
+    load_error,
+    unwrap,
+    wrap,
+)
+from ..events import CacheEvent, EventContext, Listener, LookupContext, notify
+from .scripts import (
+    CLEAR_SCRIPT,
+    GET_SCRIPT,
+    INDEX_CLEAR_SCRIPT,
+    SET_SCRIPT,
+    UNLOCK_SCRIPT,
+)
 from ..config import DefaultConfig
+from ..invalidation import (
+    INVALIDATION_CHANNEL,
+    AsyncInvalidationListener,
+    InvalidationListener,
+    encode_invalidation,
+)
+from ..lru import LRUDict
+from ..refresh import Refresher, refresher
+from ..stats import CacheInfo, CacheStats
 from ..utils import (
-    generate_strict_key,
-    generate_fast_key,
+    UnsupportedError,
+    escape_glob,
+    generate_strict_key_parts,
+    generate_strict_key_pattern_parts,
+    make_digest_key_builder,
+    make_fast_key_builder,
+    make_strict_key_builder,
+    generate_strict_key_glob,
     generate_strict_key_pattern,
+    generate_fast_key_glob,
     generate_fast_key_pattern,
 )
 
+logger = logging.getLogger(__name__)
+
 ReturnType = TypeVar("ReturnType")
 CacheFunctionType = Callable[..., ReturnType]
 
 
 class BaseCache(Generic[ReturnType], ABC):
+    #: pool refreshing the stale values, shared by all the caches
+    refresher: Refresher = refresher
+
     def __init__(
         self,
         *,
@@ -33,17 +88,62 @@ class BaseCache(Generic[ReturnType], ABC):
         is_method: bool = False,
         strict: bool = False,
         cache_key_prefix: str = "",
+        argument_index: bool = False,
+        stale_ttl: int = 0,
+        negative_ttl: Optional[int] = None,
+        negative_exceptions: Sequence[Type[BaseException]] = (),
+        latency_stats: bool = False,
+        listeners: Sequence[Listener] = (),
     ):
         self.cached_function = cast(FunctionType, cached_function)
         self.is_method = is_method
         self.expire = expire
+        #: seconds an expired value is still served while it is refreshed in the background
+        self.stale_ttl = stale_ttl if expire != -1 else 0
+        #: seconds None results and the negative exceptions are cached for, ``expire`` if None
+        self.negative_ttl = negative_ttl
+        #: exceptions cached and raised again until ``negative_ttl`` expires
+        self.negative_exceptions = tuple(negative_exceptions)
         self.limit = limit
-        self.hits = self.misses = 0
-        self.generate_key = generate_strict_key if strict else generate_fast_key
+        #: hits, misses and evictions, and the latencies with ``latency_stats``
+        self.stats = CacheStats(latency_stats)
+        #: notified of the events of this cache, on top of the global listeners
+        self.listeners: List[Listener] = list(listeners)
+        self.strict = strict
         self.generate_key_pattern = (
             generate_strict_key_pattern if strict else generate_fast_key_pattern
         )
+        self.generate_key_glob = (
+            generate_strict_key_glob if strict else generate_fast_key_glob
+        )
         self.cache_key_prefix = cache_key_prefix
+        self.argument_index = argument_index
+        make_key_builder = make_strict_key_builder if strict else make_fast_key_builder
+        #: build the cache key of a call, specialized once for the cached function
+        self.build_key = make_key_builder(
+            self.cached_function, is_method, f"{self.function_hash}:"
+        )
+        if argument_index and not strict:
+            raise ValueError("Expected strict to be True to index arguments")
+        if stale_ttl < 0:
+            raise ValueError("Expected stale_ttl to be larger equal than 0")
+        if negative_ttl is not None and negative_ttl < 1:
+            raise ValueError("Expected negative_ttl to be larger than 0")
+        if negative_exceptions and negative_ttl is None:
+            raise ValueError("Expected negative_ttl to cache exceptions")
+
+    @property
+    def hits(self) -> int:
+        return self.stats.hits
+
+    @property
+    def misses(self) -> int:
+        return self.stats.misses
+
+    @property
+    def weight(self) -> int:
+        """Estimated bytes of the cached values, 0 unless the cache weighs them"""
+        return 0
 
     @property
     def function_hash(self) -> str:
@@ -62,7 +162,9 @@ class BaseCache(Generic[ReturnType], ABC):
         ...
 
     @abstractmethod
-    def set(self, key: str, value: Any) -> None:  # pragma: no cover
+    def set(
+        self, key: str, value: Any, terms: Sequence[str] = ()
+    ) -> None:  # pragma: no cover
         ...
 
     @abstractmethod
@@ -84,22 +186,126 @@ class BaseCache(Generic[ReturnType], ABC):
         ...
 
     def cache_context(self, key: str) -> ContextManager:
-        self.hits += 1
+        """Count the lookup, and time it for the listeners if there is any.
+
+        The context it enters has a ``miss_context``, entered once the lookup misses.
+        """
+        self.stats.lookup()
+        if self.listeners or events.listeners:
+            return LookupContext(self, key)
         return self
 
     def miss_context(self, key: str) -> ContextManager:
-        self.misses += 1
-        self.hits -= 1
+        self.stats.miss()
+        return self
+
+    def event_context(self, name: str, key: Hashable) -> ContextManager:
+        """Time the operation for the listeners if there is any"""
+        if self.listeners or events.listeners:
+            return EventContext(self, name, key)
         return self
 
+    def emit(
+        self,
+        name: str,
+        key: Optional[Hashable],
+        duration: float = 0.0,
+        items: int = 1,
+    ) -> None:
+        if self.listeners or events.listeners:
+            notify(
+                self.listeners,
+                CacheEvent(name, self.namespace, key, duration, items),
+            )
+
+    def evicted(self, key: Hashable, value: Any) -> None:
+        self.stats.evict()
+        self.emit("evict", key)
+
+    @abstractmethod
+    def size(self) -> int:  # pragma: no cover
+        """Number of cached items"""
+
+    def cache_info(self) -> CacheInfo:
+        return self.stats.info(self.size(), self.limit, self.weight)
+
+    def instrument(self) -> None:
+        """Time the lookups and computations with ``latency_stats``, or do nothing.
+
+        Called once the cache is built, it wraps the methods of the instance,
+        so that the cache without ``latency_stats`` never pays for the timing.
+        """
+        if not self.stats.histograms:
+            return
+        self.get = self.stats.timed("lookup", self.get)  # type: ignore
+        self.cached_function = self.stats.timed_function(  # type: ignore
+            "compute", self.cached_function
+        )
+
+    def compute(self, key: str, args: tuple, kwargs: Dict[str, Any]) -> ReturnType:
+        try:
+            value = self.cached_function(*args, **kwargs)
+        except self.negative_exceptions as error:
+            self.set_error(key, error, self.make_index_terms(args, kwargs))
+            raise
+        self.set(key, value, self.make_index_terms(args, kwargs))
+        return value
+
+    def set_error(self, key: str, error: BaseException, terms: Sequence[str]) -> None:
+        self.set(key, CachedError(error), terms)
+
+    def get_expire(self, value: Any) -> int:
+        """Seconds the value is cached for"""
+        if self.negative_ttl is not None and (
+            value is None or type(value) is CachedError
+        ):
+            return self.negative_ttl
+        return self.expire
+
+    def refresh(self, key: str, args: tuple, kwargs: Dict[str, Any]) -> None:
+        """Recompute the stale value of the key in the background, once at a time"""
+        self.refresher.submit((self.namespace, key), self.compute, key, args, kwargs)
+
+    def get_many(
+        self,
+        calls: Iterable[Tuple[tuple, Dict[str, Any]]],
+        max_workers: Optional[int] = None,
+    ) -> List[ReturnType]:
+        """Look up a sequence of ``(args, kwargs)`` calls, return results in order."""
+        return [self.get(*args, **kwargs) for args, kwargs in calls]
+
     def make_key(self, args: tuple, kwargs: Dict[str, Any]) -> Tuple[dict, dict, str]:
-        keyword_args, kwargs, key = self.generate_key(
+        return self.build_key(args, kwargs)
+
+    def make_index_terms(self, args: tuple, kwargs: Dict[str, Any]) -> List[str]:
+        """Terms indexing the key of a call, empty unless ``argument_index`` is on"""
+        if not self.argument_index:
+            return []
+        _, _, parts = generate_strict_key_parts(
             args=args,
-            kwargs=kwargs,
+            kwargs=dict(kwargs),
             func=self.cached_function,
             is_method=self.is_method,
         )
-        return keyword_args, kwargs, f"{self.function_hash}:{key}"
+        return [self.make_term(name, value) for name, value in parts]
+
+    def make_term(self, name: str, value: str) -> str:
+        """Term of an argument, from its name and the ``repr`` of its value"""
+        return f"{name}={value}"
+
+    def make_clear_terms(
+        self, args: Optional[tuple], kwargs: Optional[Dict[str, Any]]
+    ) -> List[str]:
+        """Terms all the keys matched by a partial clear are indexed under"""
+        parts = generate_strict_key_pattern_parts(
+            args=args or tuple(),
+            kwargs=dict(kwargs or {}),
+            func=self.cached_function,
+            is_method=self.is_method,
+        )
+        return [
+            self.make_term(name, value) for name, value in parts if value is not None
+        ]
 
     def make_key_pattern(
         self, args: Optional[tuple], kwargs: Optional[Dict[str, Any]]
@@ -112,6 +318,17 @@ class BaseCache(Generic[ReturnType], ABC):
         )
         return re.compile(f"{re.escape(self.function_hash)}:{pattern}", re.DOTALL)
 
+    def make_key_glob(
+        self, args: Optional[tuple], kwargs: Optional[Dict[str, Any]]
+    ) -> str:
+        glob = self.generate_key_glob(
+            args=args or tuple(),
+            kwargs=kwargs or {},
+            func=self.cached_function,
+            is_method=self.is_method,
+        )
+        return f"{escape_glob(self.function_hash)}:{glob}"
+
     def __call__(self, *args, **kwargs):
         return self.get(*args, **kwargs)
 
@@ -126,90 +343,607 @@ DistributedCacheReturnType = TypeVar("DistributedCacheReturnType", bound=bytes)
 
 
 class DistributedCache(BaseCache[DistributedCacheReturnType]):
-    def __init__(self, *, cached_function: FunctionType, **kwargs):
+    #: seconds between two polls while waiting for another process to fill the key
+    lock_poll_interval = 0.05
+    #: - random: evict random keys of a full namespace
+    #: - lru: evict the least recently read keys across all processes
+    #: - lfu: evict the least frequently read keys across all processes
+    eviction_policies = ("random", "lru", "lfu")
+    #: number of namespace members scanned by each step of a clear
+    clear_batch_size = 1000
+    #: bytes of the blake2b digest replacing the arguments of a key
+    digest_size = 16
+    listener_cls = InvalidationListener
+    #: serialized values shorter than this many bytes are not compressed
+    compression_threshold = 1024
+
+    def __init__(
+        self,
+        *,
+        cached_function: FunctionType,
+        single_flight: bool = False,
+        lock_timeout: float = 10,
+        lock_wait: float = 5,
+        eviction: str = "random",
+        digest_key: bool = False,
+        near_cache_limit: int = 0,
+        near_cache_expire: Optional[int] = None,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        compression_threshold: Optional[int] = None,
+        early_refresh: float = 0,
+        **kwargs,
+    ):
+        if eviction not in self.eviction_policies:
+            raise ValueError(f"Expected eviction to be one of {self.eviction_policies}")
+        self.compressor: Optional[Compressor] = (
+            get_compressor(compression) if compression else None
+        )
+        self.compression_level = compression_level
+        if compression_threshold is not None:
+            self.compression_threshold = compression_threshold
+        if digest_key and kwargs.get("strict"):
+            # a digest cannot be matched, partial clears look up the argument index
+            kwargs["argument_index"] = True
         super().__init__(cached_function=cached_function, **kwargs)
-        self.client = DefaultConfig.get_current_config().cache_redis_client
+        self.digest_key = digest_key
+        if digest_key:
+            self.build_key = make_digest_key_builder(
+                self.build_key, f"{self.function_hash}:", self.digest_size
+            )
+        self.client = self.get_client()
         if self.client.connection_pool.connection_kwargs.get("decode_responses"):
             raise ValueError(
                 "Distributed cache client cannot decode response, set decode_responses to False"
             )
+        #: recompute a value before it expires, earlier the larger and the slower to compute
+        self.early_refresh = early_refresh if self.expire != -1 else 0
+        if early_refresh < 0:
+            raise ValueError("Expected early_refresh to be larger equal than 0")
+        self.single_flight = single_flight
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.unlock_script = self.client.register_script(UNLOCK_SCRIPT)
+        self.eviction = eviction
+        self.set_script = self.client.register_script(SET_SCRIPT)
+        self.get_script = self.client.register_script(GET_SCRIPT)
+        self.clear_script = self.client.register_script(CLEAR_SCRIPT)
+        self.index_clear_script = self.client.register_script(INDEX_CLEAR_SCRIPT)
+        #: in-process copies of the values, invalidated by the other processes
+        self.near_cache: Optional[LRUDict] = None
+        #: bumped by every invalidation, a read never stores a value invalidated meanwhile
+        self.generation = 0
+        self.listener: Optional[InvalidationListener] = None
+        if near_cache_limit:
+            self.near_cache = LRUDict(near_cache_limit)
+            if near_cache_expire is None:
+                near_cache_expire = self.expire
+            self.near_cache_expire = (
+                math.inf if near_cache_expire == -1 else near_cache_expire
+            )
+            self.listen()
+
+    def instrument(self) -> None:
+        super().instrument()
+        if not self.stats.histograms:
+            return
+        timed = self.stats.timed
+        self.dump = timed("serialize", self.dump)  # type: ignore
+        self.load_entry = timed("serialize", self.load_entry)  # type: ignore
+        self.fetch = timed("io", self.fetch)  # type: ignore
+        self.fetch_many = timed("io", self.fetch_many)  # type: ignore
+        self.set_script = self.time_set_script(self.set_script)
+
+    def time_set_script(self, script: Callable) -> Callable:
+        timed = self.stats.timed("io", script, inspect.iscoroutinefunction(self.set))
+
+        def set_script(*args, client=None, **kwargs):
+            # a pipelined call only queues the script, the pipeline runs it later
+            if client is not None:
+                return script(*args, client=client, **kwargs)
+            return timed(*args, **kwargs)
+
+        return set_script
+
+    def size(self) -> int:
+        return self.client.scard(self.namespace)
+
+    def listen(self) -> None:
+        """Subscribe to the invalidations of the namespace published by the other processes"""
+        self.listener = self.listener_cls.get_listener(self.client)
+        self.listener.register(self.namespace, self.invalidate)
+
+    @classmethod
+    def get_client(cls):
+        return DefaultConfig.get_current_config().cache_redis_client
+
+    @property
+    def scores_namespace(self) -> str:
+        """Sorted set scoring the keys of the namespace by the eviction policy"""
+        return f"{self.namespace}-scores"
+
+    @property
+    def indexes_namespace(self) -> str:
+        """Set of the argument index sets of the namespace"""
+        return f"{self.namespace}-indexes"
+
+    def make_key_glob(
+        self, args: Optional[tuple], kwargs: Optional[Dict[str, Any]]
+    ) -> str:
+        if self.digest_key:
+            raise UnsupportedError("digest key only support clear by argument index")
+        return super().make_key_glob(args, kwargs)
+
+    def make_term(self, name: str, value: str) -> str:
+        if self.digest_key:
+            # keep the index set names as bounded as the digest keys
+            value = blake2b(value.encode(), digest_size=self.digest_size).hexdigest()
+        return super().make_term(name, value)
+
+    def make_index_keys(self, key: str, terms: Sequence[str]) -> List[str]:
+        if not terms:
+            return []
+        return [f"{key}-indexes", *(f"{self.namespace}-index:{term}" for term in terms)]
+
+    def fetch(self, key: str) -> Optional[bytes]:
+        if self.eviction == "random":
+            return self.client.get(key)
+        return self.get_script(*self.make_get_arguments([key]))[0]
+
+    def fetch_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        if self.eviction == "random":
+            return self.client.mget(keys)
+        return self.get_script(*self.make_get_arguments(keys))
+
+    def make_get_arguments(self, keys: List[str]) -> Tuple[List[str], list]:
+        return [self.scores_namespace, *keys], [self.eviction, time.time()]
 
     def get(self, *args, **kwargs) -> DistributedCacheReturnType:
-        keyword_args, kwargs, cache_key = self.make_key(args, kwargs)
-        with self.cache_context(cache_key):
-            result = self.client.get(cache_key)
+        keyword_args, kwargs, cache_key = self.build_key(args, kwargs)
+        with self.cache_context(cache_key) as lookup:
+            if self.near_cache is not None:
+                self.listener.start()  # type: ignore
+                item = self.near_cache.get(cache_key)
+                if item is not None and time.monotonic() < item[0]:
+                    return item[1]
+            generation = self.generation
+            result = self.fetch(cache_key)
             if result is None:
-                with self.miss_context(cache_key):
-                    value = self.cached_function(*args, **keyword_args, **kwargs)
-                    self.set(cache_key, value)
-                    return value
+                with lookup.miss_context(cache_key):
+                    if self.single_flight:
+                        return self.get_single_flight(
+                            cache_key, args, {**keyword_args, **kwargs}
+                        )
+                    return self.compute(cache_key, args, {**keyword_args, **kwargs})
             else:
-                return self.deserialize(result)  # type: ignore
+                envelope, value = self.load_entry(result)
+                if envelope is None or self.is_fresh_entry(envelope):
+                    if self.near_cache is not None and generation == self.generation:
+                        self.near_store(cache_key, value)
+                elif envelope.fresh_until < time.time():
+                    self.refresh(cache_key, args, {**keyword_args, **kwargs})
+                else:
+                    with lookup.miss_context(cache_key):
+                        return self.compute(cache_key, args, {**keyword_args, **kwargs})
+                return value  # type: ignore
+
+    def is_fresh_entry(self, envelope: Envelope) -> bool:
+        """Probabilistic early expiration (XFetch): as the value gets closer to expire,
+        each read is more likely to recompute it, so one of them does it beforehand.
+        """
+        now = time.time()
+        if self.early_refresh:
+            # log of (0, 1] is negative, move the current time towards the expiration
+            now -= envelope.delta * self.early_refresh * math.log(1 - random.random())
+        return now < envelope.fresh_until
 
-    def set(self, key: str, value: DistributedCacheReturnType) -> None:
-        self.client.sadd(
-            self.get_backend_namespace(self.cache_key_prefix), self.namespace
+    def compute(
+        self, key: str, args: tuple, kwargs: Dict[str, Any]
+    ) -> DistributedCacheReturnType:
+        start = time.monotonic()
+        try:
+            value = self.cached_function(*args, **kwargs)
+        except self.negative_exceptions as error:
+            self.set_error(key, error, self.make_index_terms(args, kwargs))
+            raise
+        delta = time.monotonic() - start
+        self.set(key, value, self.make_index_terms(args, kwargs), delta)
+        return value
+
+    def set_error(self, key: str, error: BaseException, terms: Sequence[str]) -> None:
+        if dump_error(error) is not None:
+            self.set(key, CachedError(error), terms)  # type: ignore
+
+    def refresh(self, key: str, args: tuple, kwargs: Dict[str, Any]) -> None:
+        self.refresher.submit(
+            (self.namespace, key), self.compute_locked, key, args, kwargs
         )
-        value = self.serialize(value)
-        while self.client.scard(self.namespace) >= self.limit:
-            del_key = self.client.spop(self.namespace)
-            if isinstance(del_key, bytes):
-                self.client.delete(del_key.decode())
 
-        with self.client.pipeline() as pipe:
-            if self.expire == -1:
-                pipe.set(key, value)
-            else:
-                pipe.setex(key, self.expire, value)
+    def compute_locked(
+        self, key: str, args: tuple, kwargs: Dict[str, Any], reuse: bool = False
+    ) -> Tuple[bool, Optional[DistributedCacheReturnType]]:
+        """Compute the key unless another process holds its lock,
+        return whether the lock was acquired and the value.
 
-            pipe.sadd(self.namespace, key)
-            pipe.execute()
+        :param reuse: return the value stored by the previous holder of the lock
+            rather than computing it again.
+        """
+        lock_key = f"{key}-lock"
+        token = uuid4().hex.encode()
+        if not self.client.set(
+            lock_key, token, nx=True, px=int(self.lock_timeout * 1000)
+        ):
+            return False, None
+        try:
+            if reuse:
+                result = self.client.get(key)
+                if result is not None:
+                    return True, self.load(result)
+            return True, self.compute(key, args, kwargs)
+        finally:
+            self.unlock_script(keys=[lock_key], args=[token])
+
+    def get_single_flight(
+        self, key: str, args: tuple, kwargs: Dict[str, Any]
+    ) -> DistributedCacheReturnType:
+        """Let only one process compute the missing key while the others poll for it.
+
+        If the value does not show up within ``lock_wait`` seconds, the waiting
+        process computes it by itself rather than failing the call.
+        """
+        locked, value = self.compute_locked(key, args, kwargs, reuse=True)
+        if locked:
+            return value  # type: ignore
+
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(self.lock_poll_interval)
+            result = self.client.get(key)
+            if result is not None:
+                return self.load(result)
+        return self.compute(key, args, kwargs)
+
+    def get_many(
+        self,
+        calls: Iterable[Tuple[tuple, Dict[str, Any]]],
+        max_workers: Optional[int] = None,
+    ) -> List[DistributedCacheReturnType]:
+        """Resolve every call with one ``MGET`` and write all the misses in one pipeline.
+
+        :param calls: a sequence of ``(args, kwargs)`` pairs.
+        :param max_workers: compute the misses in a thread pool of this size if given.
+        """
+        start = time.perf_counter()
+        cache_keys, call_arguments = self.make_many_keys(calls)
+        results = self.fetch_many(cache_keys)
+        missed = self.find_misses(cache_keys, call_arguments, results)
+
+        def call(arguments: Tuple[tuple, Dict[str, Any]]) -> Tuple[Any, float]:
+            args, kwargs = arguments
+            start = time.monotonic()
+            value = self.cached_function(*args, **kwargs)
+            return value, time.monotonic() - start
+
+        if max_workers and len(missed) > 1:
+            with ThreadPoolExecutor(max_workers) as executor:
+                timed = dict(zip(missed, executor.map(call, missed.values())))
+        else:
+            timed = dict(zip(missed, map(call, missed.values())))
+        computed = {key: value for key, (value, _) in timed.items()}
+        self.set_many(
+            computed,
+            self.make_many_index_terms(missed),
+            {key: delta for key, (_, delta) in timed.items()},
+        )
+        values = self.merge_many(cache_keys, call_arguments, results, computed)
+        self.emit_lookups(cache_keys, missed, time.perf_counter() - start)
+        return values
+
+    def make_many_keys(
+        self, calls: Iterable[Tuple[tuple, Dict[str, Any]]]
+    ) -> Tuple[List[str], List[Tuple[tuple, Dict[str, Any]]]]:
+        cache_keys, call_arguments = [], []
+        for args, kwargs in calls:
+            keyword_args, kwargs, cache_key = self.make_key(args, dict(kwargs))
+            cache_keys.append(cache_key)
+            call_arguments.append((args, {**keyword_args, **kwargs}))
+        return cache_keys, call_arguments
+
+    def find_misses(
+        self,
+        cache_keys: List[str],
+        call_arguments: List[Tuple[tuple, Dict[str, Any]]],
+        results: List[Optional[bytes]],
+    ) -> Dict[str, Tuple[tuple, Dict[str, Any]]]:
+        missed: Dict[str, Tuple[tuple, Dict[str, Any]]] = {}
+        misses = 0
+        for cache_key, arguments, result in zip(cache_keys, call_arguments, results):
+            if result is None:
+                missed.setdefault(cache_key, arguments)
+                misses += 1
+        self.stats.lookup(len(cache_keys), misses)
+        return missed
+
+    def emit_lookups(
+        self, cache_keys: List[str], missed: Dict[str, Any], duration: float
+    ) -> None:
+        if self.listeners or events.listeners:
+            for cache_key in cache_keys:
+                self.emit("miss" if cache_key in missed else "hit", cache_key, duration)
+
+    def make_many_index_terms(
+        self, missed: Dict[str, Tuple[tuple, Dict[str, Any]]]
+    ) -> Dict[str, Sequence[str]]:
+        if not self.argument_index:
+            return {}
+        return {
+            cache_key: self.make_index_terms(args, kwargs)
+            for cache_key, (args, kwargs) in missed.items()
+        }
+
+    def merge_many(
+        self,
+        cache_keys: List[str],
+        call_arguments: List[Tuple[tuple, Dict[str, Any]]],
+        results: List[Optional[bytes]],
+        computed: Dict[str, Any],
+    ) -> List[DistributedCacheReturnType]:
+        """Values of the calls in order, the stale ones are refreshed in the background,
+        along with the ones expiring early, rather than holding the whole batch.
+        """
+        values = []
+        for cache_key, (args, kwargs), result in zip(
+            cache_keys, call_arguments, results
+        ):
+            if result is None:
+                values.append(computed[cache_key])
+                continue
+            envelope, value = self.load_entry(result)
+            if envelope is not None and not self.is_fresh_entry(envelope):
+                self.refresh(cache_key, args, kwargs)
+            values.append(value)
+        return values
+
+    def set(
+        self,
+        key: str,
+        value: DistributedCacheReturnType,
+        terms: Sequence[str] = (),
+        delta: float = 0.0,
+    ) -> None:
+        with self.event_context("set", key):
+            evicted = self.set_script(
+                *self.make_set_arguments(key, value, terms, delta)
+            )
+            if evicted:
+                self.evicted_keys(evicted)
+            if self.near_cache is not None:
+                self.near_store(key, value)
+                self.listener.publish(self.namespace, key)  # type: ignore
+
+    def near_store(self, key: str, value: Any) -> None:
+        if type(value) is CachedError:
+            # raised again by the reads of Redis, never returned by the near cache
+            self.near_cache.pop(key, None)  # type: ignore
+            return
+        self.near_cache[key] = (  # type: ignore
+            time.monotonic() + self.near_cache_expire,
+            value,
+        )
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop the near cache copy of the key, or all of them if None"""
+        self.generation += 1
+        if key is None:
+            self.near_cache.clear()  # type: ignore
+        else:
+            self.near_cache.pop(key, None)  # type: ignore
+
+    def make_invalidation(self, key: str) -> bytes:
+        return encode_invalidation(self.listener.token, self.namespace, key)  # type: ignore
+
+    def set_many(
+        self,
+        items: Dict[str, DistributedCacheReturnType],
+        terms: Optional[Dict[str, Sequence[str]]] = None,
+        deltas: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """Write all the items in one pipeline.
+
+        :param deltas: seconds each value took to compute, to refresh it early.
+        """
+        if not items:
+            return
+        terms = terms or {}
+        deltas = deltas or {}
+        if self.near_cache is not None:
+            self.listener.start()  # type: ignore
+        start = time.perf_counter()
+        with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                self.set_script(
+                    *self.make_set_arguments(
+                        key, value, terms.get(key, ()), deltas.get(key, 0.0)
+                    ),
+                    client=pipe,
+                )
+                if self.near_cache is not None:
+                    self.near_store(key, value)
+                    pipe.publish(INVALIDATION_CHANNEL, self.make_invalidation(key))
+            results = pipe.execute()
+        self.emit_sets(items, time.perf_counter() - start, results)
+
+    def emit_sets(self, items: Dict[str, Any], duration: float, results: list) -> None:
+        """Count the keys evicted by the pipelined set scripts, notify the listeners"""
+        for result in results:
+            if isinstance(result, list) and result:
+                self.evicted_keys(result)
+        if self.listeners or events.listeners:
+            for key in items:
+                self.emit("set", key, duration)
+
+    def evicted_keys(self, keys: List[bytes]) -> None:
+        """Count the keys evicted from Redis by a set script"""
+        self.stats.evict(len(keys))
+        if self.listeners or events.listeners:
+            for key in keys:
+                self.emit("evict", key.decode())
+
+    def make_set_arguments(
+        self,
+        key: str,
+        value: DistributedCacheReturnType,
+        terms: Sequence[str] = (),
+        delta: float = 0.0,
+    ) -> Tuple[List[str], list]:
+        data, expire = self.dump(value), self.get_expire(value)
+        if self.stale_ttl or self.early_refresh:
+            data = wrap(data, Envelope(time.time() + expire, delta))  # type: ignore
+            # keep the value stale_ttl seconds longer, to serve it while it is refreshed
+            expire += self.stale_ttl
+        return (
+            [
+                self.get_backend_namespace(self.cache_key_prefix),
+                self.namespace,
+                self.scores_namespace,
+                key,
+                self.indexes_namespace,
+                *self.make_index_keys(key, terms),
+            ],
+            [
+                self.limit,
+                expire,
+                data,
+                self.eviction,
+                time.time(),
+            ],
+        )
 
     def cache_clear(
         self, args: Optional[tuple] = None, kwargs: Optional[dict] = None
     ) -> int:
+        start = time.perf_counter()
+        count = self.clear_keys(args, kwargs)
+        self.invalidate_all()
+        self.emit("clear", None, time.perf_counter() - start, count)
+        return count
+
+    def clear_keys(self, args: Optional[tuple], kwargs: Optional[dict]) -> int:
         if args or kwargs:
-            pattern = self.make_key_pattern(args=args, kwargs=kwargs)
-            delete_keys = set(
-                filter(
-                    pattern.match,
-                    map(bytes.decode, self.client.smembers(self.namespace)),
-                )
+            terms = self.make_clear_terms(args, kwargs) if self.argument_index else []
+            if terms:
+                return self.index_clear_script(*self.make_index_clear_arguments(terms))
+            return self.scan_clear(
+                self.clear_script,
+                self.namespace,
+                self.make_key_glob(args=args, kwargs=kwargs),
             )
-            if delete_keys:
-                self.client.delete(*delete_keys)
-        else:
-            with self.client.pipeline() as pipe:
-                delete_keys = self.client.smembers(self.namespace)
-                if delete_keys:
-                    pipe.delete(*delete_keys)
-                    pipe.srem(self.namespace, *delete_keys)
-                pipe.srem(
-                    self.get_backend_namespace(self.cache_key_prefix), self.namespace
-                )
-                pipe.execute()
-        return len(delete_keys)
+        count = self.scan_clear(self.clear_script, self.namespace)
+        self.scan_clear(self.clear_script, self.indexes_namespace)
+        with self.client.pipeline() as pipe:
+            pipe.delete(self.scores_namespace)
+            pipe.srem(self.get_backend_namespace(self.cache_key_prefix), self.namespace)
+            pipe.execute()
+        return count
+
+    def invalidate_all(self) -> None:
+        """Drop the in-process copies of the namespace in every process"""
+        if self.listener is not None:
+            self.invalidate()
+            self.listener.publish(self.namespace)  # type: ignore
+
+    def make_index_clear_arguments(
+        self, terms: Sequence[str]
+    ) -> Tuple[List[str], list]:
+        return (
+            [
+                self.namespace,
+                self.scores_namespace,
+                *(f"{self.namespace}-index:{term}" for term in terms),
+            ],
+            [],
+        )
+
+    @classmethod
+    def scan_clear(
+        cls, script, namespace: Union[str, bytes], pattern: str = "*"
+    ) -> int:
+        """Delete the namespace keys matching the pattern inside Redis.
+
+        The namespace is scanned incrementally by batches, so a large namespace
+        neither blocks Redis nor travels to the client, only counts come back.
+        """
+        if isinstance(namespace, bytes):
+            namespace = namespace.decode()
+        keys = [namespace, f"{namespace}-scores"]
+        cursor, count = 0, 0
+        while True:
+            cursor, deleted = script(
+                keys=keys, args=[cursor, pattern, cls.clear_batch_size]
+            )
+            count += deleted
+            if int(cursor) == 0:
+                return count
 
     @classmethod
     def get_all_namespace(cls, cache_key_prefix: str = "") -> Set[str]:
-        client = DefaultConfig.get_current_config().cache_redis_client
+        client = cls.get_client()
         return client.smembers(cls.get_backend_namespace(cache_key_prefix))
 
     @classmethod
     def flush_cache(cls, cache_key_prefix: str = "") -> int:
-        client = DefaultConfig.get_current_config().cache_redis_client
+        client = cls.get_client()
+        script = client.register_script(CLEAR_SCRIPT)
         count = 0
         with client.pipeline() as pipe:
-            for namespace in cls.get_all_namespace(cache_key_prefix):
-                delete_keys = client.smembers(namespace)
-                if delete_keys:
-                    pipe.delete(*delete_keys)
-                    count += len(delete_keys)
-                pipe.delete(namespace)
+            for name in cls.get_all_namespace(cache_key_prefix):
+                namespace = name.decode()  # type: ignore
+                count += cls.scan_clear(script, namespace)
+                cls.scan_clear(script, f"{namespace}-indexes")
+                pipe.delete(namespace, f"{namespace}-scores")
+                pipe.publish(
+                    INVALIDATION_CHANNEL, encode_invalidation("", namespace, None)
+                )
             else:
                 pipe.execute()
         return count
 
+    def dump(self, value: DistributedCacheReturnType) -> DistributedCacheReturnType:
+        """Serialize the value, then compress it if it is large enough"""
+        if type(value) is CachedError:
+            return dump_error(value.error)  # type: ignore
+        data = self.serialize(value)
+        if (
+            self.compressor is not None
+            and isinstance(data, bytes)
+            and len(data) >= self.compression_threshold
+        ):
+            return compress(data, self.compressor, self.compression_level)  # type: ignore
+        return data
+
+    def load(self, result: bytes) -> DistributedCacheReturnType:
+        """Decompress the result if it is tagged as compressed, then deserialize it"""
+        return self.load_entry(result)[1]
+
+    def load_entry(
+        self, result: bytes
+    ) -> Tuple[Optional[Envelope], DistributedCacheReturnType]:
+        """Load the value and its metadata, None without ``stale_ttl`` or ``early_refresh``.
+
+        Raise the cached exception stored in place of the value, only unpickled
+        by the caches with ``negative_exceptions``.
+        """
+        envelope, result = unwrap(result)
+        if result[:1] == ERROR_TAG:
+            if not self.negative_exceptions:
+                raise ValueError(
+                    "Expected negative_exceptions to load a cached exception"
+                )
+            raise load_error(result)
+        return envelope, self.deserialize(decompress(result))  # type: ignore
+
     def serialize(
         self, value: DistributedCacheReturnType
     ) -> DistributedCacheReturnType:
@@ -219,3 +953,300 @@ class DistributedCache(BaseCache[DistributedCacheReturnType]):
         self, result: DistributedCacheReturnType
     ) -> DistributedCacheReturnType:
         return result
+
+
+class AsyncDistributedCache(DistributedCache):
+    """Distributed cache awaiting a ``redis.asyncio`` client.
+
+    Keys, namespaces and ``cache_clear`` behave the same as :class:`DistributedCache`,
+    but every method touching Redis is a coroutine. The cached function may be
+    either a coroutine function or a plain function.
+    """
+
+    listener_cls = AsyncInvalidationListener  # type: ignore
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        #: keys refreshed by a task right now
+        self.refreshing: Set[str] = set()
+        #: the refreshing tasks, referenced until they are done
+        self.refresh_tasks: Set[asyncio.Future] = set()
+
+    @classmethod
+    def get_client(cls):
+        return DefaultConfig.get_current_config().cache_async_redis_client
+
+    async def size(self) -> int:  # type: ignore
+        return await self.client.scard(self.namespace)
+
+    async def cache_info(self) -> CacheInfo:  # type: ignore
+        return self.stats.info(await self.size(), self.limit, self.weight)
+
+    async def fetch(self, key: str) -> Optional[bytes]:  # type: ignore
+        if self.eviction == "random":
+            return await self.client.get(key)
+        return (await self.get_script(*self.make_get_arguments([key])))[0]
+
+    async def fetch_many(self, keys: List[str]) -> List[Optional[bytes]]:  # type: ignore
+        if not keys:
+            return []
+        if self.eviction == "random":
+            return await self.client.mget(keys)
+        return await self.get_script(*self.make_get_arguments(keys))
+
+    async def get(self, *args, **kwargs) -> DistributedCacheReturnType:  # type: ignore
+        keyword_args, kwargs, cache_key = self.build_key(args, kwargs)
+        with self.cache_context(cache_key) as lookup:
+            if self.near_cache is not None:
+                self.listener.start()  # type: ignore
+                item = self.near_cache.get(cache_key)
+                if item is not None and time.monotonic() < item[0]:
+                    return item[1]
+            generation = self.generation
+            result = await self.fetch(cache_key)
+            if result is None:
+                with lookup.miss_context(cache_key):
+                    if self.single_flight:
+                        return await self.get_single_flight(
+                            cache_key, args, {**keyword_args, **kwargs}
+                        )
+                    return await self.compute(
+                        cache_key, args, {**keyword_args, **kwargs}
+                    )
+            else:
+                envelope, value = self.load_entry(result)
+                if envelope is None or self.is_fresh_entry(envelope):
+                    if self.near_cache is not None and generation == self.generation:
+                        self.near_store(cache_key, value)
+                elif envelope.fresh_until < time.time():
+                    self.refresh(cache_key, args, {**keyword_args, **kwargs})
+                else:
+                    with lookup.miss_context(cache_key):
+                        return await self.compute(
+                            cache_key, args, {**keyword_args, **kwargs}
+                        )
+                return value  # type: ignore
+
+    def refresh(self, key: str, args: tuple, kwargs: Dict[str, Any]) -> None:
+        """Recompute the stale value of the key in a task, once at a time"""
+        refreshing = self.refreshing
+        if key in refreshing or len(refreshing) >= self.refresher.max_pending:
+            return
+        refreshing.add(key)
+        task = asyncio.ensure_future(self.compute_locked(key, args, kwargs))
+        self.refresh_tasks.add(task)
+        task.add_done_callback(lambda _: self.refreshed(key, task))
+
+    def refreshed(self, key: str, task: asyncio.Future) -> None:
+        self.refreshing.discard(key)
+        self.refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to refresh %r", key, exc_info=task.exception())
+
+    async def compute_locked(  # type: ignore
+        self, key: str, args: tuple, kwargs: Dict[str, Any], reuse: bool = False
+    ) -> Tuple[bool, Optional[DistributedCacheReturnType]]:
+        lock_key = f"{key}-lock"
+        token = uuid4().hex.encode()
+        if not await self.client.set(
+            lock_key, token, nx=True, px=int(self.lock_timeout * 1000)
+        ):
+            return False, None
+        try:
+            if reuse:
+                result = await self.client.get(key)
+                if result is not None:
+                    return True, self.load(result)
+            return True, await self.compute(key, args, kwargs)
+        finally:
+            await self.unlock_script(keys=[lock_key], args=[token])
+
+    async def compute(  # type: ignore
+        self, key: str, args: tuple, kwargs: Dict[str, Any]
+    ) -> DistributedCacheReturnType:
+        start = time.monotonic()
+        try:
+            value = await self.call(args, kwargs)
+        except self.negative_exceptions as error:
+            if dump_error(error) is not None:
+                await self.set(
+                    key, CachedError(error), self.make_index_terms(args, kwargs)  # type: ignore
+                )
+            raise
+        delta = time.monotonic() - start
+        await self.set(key, value, self.make_index_terms(args, kwargs), delta)
+        return value
+
+    async def call(self, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        value = self.cached_function(*args, **kwargs)
+        if inspect.isawaitable(value):
+            value = await value
+        return value
+
+    async def timed_call(
+        self, args: tuple, kwargs: Dict[str, Any]
+    ) -> Tuple[Any, float]:
+        """The value and the seconds it took to compute"""
+        start = time.monotonic()
+        value = await self.call(args, kwargs)
+        return value, time.monotonic() - start
+
+    async def get_many(  # type: ignore
+        self,
+        calls: Iterable[Tuple[tuple, Dict[str, Any]]],
+        max_workers: Optional[int] = None,
+    ) -> List[DistributedCacheReturnType]:
+        """Same as :meth:`DistributedCache.get_many`, misses are computed concurrently."""
+        start = time.perf_counter()
+        cache_keys, call_arguments = self.make_many_keys(calls)
+        results = await self.fetch_many(cache_keys)
+        missed = self.find_misses(cache_keys, call_arguments, results)
+        timed = dict(
+            zip(
+                missed,
+                await asyncio.gather(
+                    *(self.timed_call(args, kwargs) for args, kwargs in missed.values())
+                ),
+            )
+        )
+        computed = {key: value for key, (value, _) in timed.items()}
+        await self.set_many(
+            computed,
+            self.make_many_index_terms(missed),
+            {key: delta for key, (_, delta) in timed.items()},
+        )
+        values = self.merge_many(cache_keys, call_arguments, results, computed)
+        self.emit_lookups(cache_keys, missed, time.perf_counter() - start)
+        return values
+
+    async def get_single_flight(  # type: ignore
+        self, key: str, args: tuple, kwargs: Dict[str, Any]
+    ) -> DistributedCacheReturnType:
+        locked, value = await self.compute_locked(key, args, kwargs, reuse=True)
+        if locked:
+            return value  # type: ignore
+
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.lock_poll_interval)
+            result = await self.client.get(key)
+            if result is not None:
+                return self.load(result)
+        return await self.compute(key, args, kwargs)
+
+    async def set(  # type: ignore
+        self,
+        key: str,
+        value: DistributedCacheReturnType,
+        terms: Sequence[str] = (),
+        delta: float = 0.0,
+    ) -> None:
+        with self.event_context("set", key):
+            evicted = await self.set_script(
+                *self.make_set_arguments(key, value, terms, delta)
+            )
+            if evicted:
+                self.evicted_keys(evicted)
+            if self.near_cache is not None:
+                self.near_store(key, value)
+                await self.listener.publish(self.namespace, key)  # type: ignore
+
+    async def set_many(  # type: ignore
+        self,
+        items: Dict[str, DistributedCacheReturnType],
+        terms: Optional[Dict[str, Sequence[str]]] = None,
+        deltas: Optional[Dict[str, float]] = None,
+    ) -> None:
+        if not items:
+            return
+        terms = terms or {}
+        deltas = deltas or {}
+        start = time.perf_counter()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                await self.set_script(
+                    *self.make_set_arguments(
+                        key, value, terms.get(key, ()), deltas.get(key, 0.0)
+                    ),
+                    client=pipe,
+                )
+                if self.near_cache is not None:
+                    self.near_store(key, value)
+                    pipe.publish(INVALIDATION_CHANNEL, self.make_invalidation(key))
+            results = await pipe.execute()
+        self.emit_sets(items, time.perf_counter() - start, results)
+
+    async def cache_clear(  # type: ignore
+        self, args: Optional[tuple] = None, kwargs: Optional[dict] = None
+    ) -> int:
+        start = time.perf_counter()
+        count = await self.clear_keys(args, kwargs)
+        await self.invalidate_all()
+        self.emit("clear", None, time.perf_counter() - start, count)
+        return count
+
+    async def invalidate_all(self) -> None:  # type: ignore
+        if self.listener is not None:
+            self.invalidate()
+            await self.listener.publish(self.namespace)  # type: ignore
+
+    async def clear_keys(  # type: ignore
+        self, args: Optional[tuple], kwargs: Optional[dict]
+    ) -> int:
+        if args or kwargs:
+            terms = self.make_clear_terms(args, kwargs) if self.argument_index else []
+            if terms:
+                return await self.index_clear_script(
+                    *self.make_index_clear_arguments(terms)
+                )
+            return await self.scan_clear(
+                self.clear_script,
+                self.namespace,
+                self.make_key_glob(args=args, kwargs=kwargs),
+            )
+        count = await self.scan_clear(self.clear_script, self.namespace)
+        await self.scan_clear(self.clear_script, self.indexes_namespace)
+        async with self.client.pipeline() as pipe:
+            pipe.delete(self.scores_namespace)
+            pipe.srem(self.get_backend_namespace(self.cache_key_prefix), self.namespace)
+            await pipe.execute()
+        return count
+
+    @classmethod
+    async def scan_clear(  # type: ignore
+        cls, script, namespace: Union[str, bytes], pattern: str = "*"
+    ) -> int:
+        if isinstance(namespace, bytes):
+            namespace = namespace.decode()
+        keys = [namespace, f"{namespace}-scores"]
+        cursor, count = 0, 0
+        while True:
+            cursor, deleted = await script(
+                keys=keys, args=[cursor, pattern, cls.clear_batch_size]
+            )
+            count += deleted
+            if int(cursor) == 0:
+                return count
+
+    @classmethod
+    async def get_all_namespace(cls, cache_key_prefix: str = "") -> Set[str]:  # type: ignore
+        client = cls.get_client()
+        return await client.smembers(cls.get_backend_namespace(cache_key_prefix))
+
+    @classmethod
+    async def flush_cache(cls, cache_key_prefix: str = "") -> int:  # type: ignore
+        client = cls.get_client()
+        script = client.register_script(CLEAR_SCRIPT)
+        count = 0
+        async with client.pipeline() as pipe:
+            for name in await cls.get_all_namespace(cache_key_prefix):
+                namespace = name.decode()  # type: ignore
+                count += await cls.scan_clear(script, namespace)
+                await cls.scan_clear(script, f"{namespace}-indexes")
+                pipe.delete(namespace, f"{namespace}-scores")
+                pipe.publish(
+                    INVALIDATION_CHANNEL, encode_invalidation("", namespace, None)
+                )
+            else:
+                await pipe.execute()
+        return count
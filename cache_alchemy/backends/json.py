@@ -1,6 +1,6 @@
 import json
 
-from .base import DistributedCache, BaseCache, ReturnType
+from .base import AsyncDistributedCache, DistributedCache, BaseCache, ReturnType
 
 
 class DistributedJsonCache(DistributedCache, BaseCache[ReturnType]):
@@ -9,3 +9,7 @@ class DistributedJsonCache(DistributedCache, BaseCache[ReturnType]):
 
     def deserialize(self, result: bytes) -> ReturnType:
         return json.loads(result.decode())
+
+
+class AsyncDistributedJsonCache(AsyncDistributedCache, DistributedJsonCache):
+    pass
@@ -1,8 +1,28 @@
+import heapq
+import itertools
+import math
 import time
-from typing import Any, Callable, Dict, TypeVar, Set, Optional
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    TypeVar,
+    Sequence,
+    Set,
+    Optional,
+    Tuple,
+)
 
 from .base import BaseCache, DistributedCache
-from ..lru import LRUDict
+from ..envelope import CachedError
+from ..eviction import get_eviction_dict
+from ..index import ArgumentIndex
+from ..lru import LRUDict, sizeof
+from ..single_flight import SingleFlight
+from ..utils import make_tuple_key_builder
 
 ReturnType = TypeVar("ReturnType")
 FunctionType = Callable[..., ReturnType]
@@ -11,7 +31,7 @@ FunctionType = Callable[..., ReturnType]
 class CacheItem:
     __slots__ = ("timestamp", "value")
 
-    def __init__(self, timestamp: int, value: Any):
+    def __init__(self, timestamp: float, value: Any):
         self.timestamp = timestamp
         self.value = value
 
@@ -20,41 +40,213 @@ all_cache_pool: Dict[str, Dict] = {}
 
 
 class MemoryCache(BaseCache):
-    cache_pool: Dict[str, CacheItem]
+    cache_pool: Dict[Hashable, CacheItem]
+    #: most expired items reclaimed by one call, keep every call cheap
+    expire_batch = 64
 
-    def __init__(self, *, cached_function: FunctionType, **kwargs):
+    def __init__(
+        self,
+        *,
+        cached_function: FunctionType,
+        single_flight: bool = False,
+        tuple_key: bool = False,
+        eviction: str = "lru",
+        max_bytes: Optional[int] = None,
+        weigher: Callable[[Any], int] = sizeof,
+        **kwargs,
+    ):
         super().__init__(cached_function=cached_function, **kwargs)
-        if self.limit == -1:
+        eviction_dict = get_eviction_dict(eviction)
+        if max_bytes is not None and eviction != "lru":
+            raise ValueError("Expected eviction to be lru to limit the bytes")
+        if tuple_key:
+            if self.strict:
+                raise ValueError("Expected strict to be False to key by tuple")
+            self.build_key = make_tuple_key_builder(  # type: ignore
+                self.cached_function, self.is_method
+            )
+        self.index = ArgumentIndex() if self.argument_index else None
+        #: estimate the bytes of a cached value
+        self.weigher = weigher
+        if max_bytes is not None:
+            self.cache_pool = LRUDict(
+                math.inf if self.limit == -1 else self.limit,
+                on_evict=self.evicted,
+                weigher=self.weigh,
+                max_weight=max_bytes,
+            )
+        elif self.limit == -1:
             self.cache_pool = dict()
         else:
-            self.cache_pool = LRUDict(self.limit)
+            self.cache_pool = eviction_dict(  # type: ignore
+                self.limit, on_evict=self.evicted
+            )
+        self.in_flight = SingleFlight() if single_flight else None
+        #: min-heap of (deadline, order, key), reclaim the expired items never read again
+        self.deadlines: List[Tuple[int, int, Hashable]] = []
+        self.deadlines_lock = Lock()
+        self.deadlines_order = itertools.count()
+        #: guard the unbounded pool, a plain dict, against reclaiming an item set again
+        self.pool_lock = Lock()
+        #: deadline at the top of the heap, read without the lock
+        self.next_deadline = math.inf
 
     def get(self, *args, **kwargs) -> ReturnType:
-        keyword_args, kwargs, cache_key = self.make_key(args, kwargs)
-        with self.cache_context(cache_key):
+        keyword_args, kwargs, cache_key = self.build_key(args, kwargs)
+        with self.cache_context(cache_key) as lookup:
             timestamp = self.get_timestamp()
+            if self.next_deadline < timestamp:
+                self.reclaim_expired(timestamp)
             cache_info = self.cache_pool.get(cache_key)
             if cache_info and timestamp <= cache_info.timestamp:
-                return cache_info.value
+                value = cache_info.value
+            elif cache_info and timestamp <= cache_info.timestamp + self.stale_ttl:
+                self.refresh(cache_key, args, {**keyword_args, **kwargs})
+                value = cache_info.value
             else:
-                with self.miss_context(cache_key):
-                    value = self.cached_function(*args, **keyword_args, **kwargs)
-                    self.set(cache_key, value)
-                    return value
+                with lookup.miss_context(cache_key):
+                    if self.in_flight is not None:
+                        return self.in_flight.do(
+                            cache_key,
+                            self.compute,
+                            cache_key,
+                            args,
+                            {**keyword_args, **kwargs},
+                        )
+                    return self.compute(cache_key, args, {**keyword_args, **kwargs})
+            if type(value) is CachedError:
+                raise value.error.with_traceback(None)
+            return value
 
     def get_timestamp(self) -> int:
         return int(time.time())
 
-    def set(self, key: str, value: Any) -> None:
+    def set(self, key: str, value: Any, terms: Sequence[str] = ()) -> None:
         all_cache_pool[self.namespace] = self.cache_pool
-        self.cache_pool[key] = CacheItem(
-            timestamp=int(time.time()) + self.expire, value=value
-        )
+        with self.event_context("set", key):
+            if terms and self.index is not None:
+                # before the pool, which drops the key at once if it is too large
+                self.index.add(key, terms)
+            expire = self.get_expire(value)
+            if expire == -1:
+                self.store(key, CacheItem(timestamp=math.inf, value=value))
+            else:
+                deadline = self.get_timestamp() + expire
+                self.store(key, CacheItem(timestamp=deadline, value=value))
+                with self.deadlines_lock:
+                    heapq.heappush(
+                        self.deadlines,
+                        (deadline + self.stale_ttl, next(self.deadlines_order), key),
+                    )
+                    if (
+                        len(self.deadlines)
+                        > 2 * len(self.cache_pool) + self.expire_batch
+                    ):
+                        self.compact_deadlines()
+                    self.next_deadline = (
+                        self.deadlines[0][0] if self.deadlines else math.inf
+                    )
+
+    def reclaim_expired(self, timestamp: Optional[int] = None) -> int:
+        """Remove at most ``expire_batch`` expired items, return the number removed.
+
+        Reads reclaim a batch whenever the earliest deadline has passed,
+        call it from a timer to reclaim the items of an idle cache.
+        """
+        if timestamp is None:
+            timestamp = self.get_timestamp()
+        expired: List[Hashable] = []
+        with self.deadlines_lock:
+            while (
+                self.deadlines
+                and self.deadlines[0][0] < timestamp
+                and len(expired) < self.expire_batch
+            ):
+                expired.append(heapq.heappop(self.deadlines)[2])
+            self.next_deadline = self.deadlines[0][0] if self.deadlines else math.inf
+        count = 0
+        for key in expired:
+            # the key may be set again with a later deadline, or evicted already
+            item = self.peek(key)
+            if (
+                item is not None
+                and item.timestamp + self.stale_ttl < timestamp
+                and self.remove(key, item)
+            ):
+                count += 1
+                if self.index is not None:
+                    self.index.discard(key)  # type: ignore
+        return count
+
+    def store(self, key: Hashable, item: CacheItem) -> None:
+        if type(self.cache_pool) is dict:
+            with self.pool_lock:
+                self.cache_pool[key] = item
+        else:
+            self.cache_pool[key] = item
+
+    def remove(self, key: Hashable, item: CacheItem) -> bool:
+        """Remove the key only if it still holds the item, return whether it did"""
+        if type(self.cache_pool) is not dict:
+            return self.cache_pool.remove(key, item)  # type: ignore
+        with self.pool_lock:
+            if self.cache_pool.get(key) is not item:
+                return False
+            del self.cache_pool[key]
+            return True
+
+    def compact_deadlines(self) -> None:
+        """Drop the deadlines of the keys evicted or set again, with the lock held.
+
+        Run once the heap outgrows twice the pool, so it costs O(1) per set on average.
+        """
+        deadlines, seen = [], set()
+        for entry in self.deadlines:
+            deadline, _, key = entry
+            item = self.peek(key)
+            if (
+                item is not None
+                and item.timestamp + self.stale_ttl == deadline
+                and key not in seen
+            ):
+                seen.add(key)
+                deadlines.append(entry)
+        heapq.heapify(deadlines)
+        self.deadlines = deadlines
+
+    def peek(self, key: Hashable) -> Optional[CacheItem]:
+        """Read the item without counting an access for the eviction policy"""
+        if type(self.cache_pool) is dict:
+            return self.cache_pool.get(key)
+        return self.cache_pool.peek(key)  # type: ignore
+
+    def weigh(self, item: CacheItem) -> int:
+        return self.weigher(item.value)
+
+    @property
+    def weight(self) -> int:
+        """Estimated bytes of the cached values, 0 without ``max_bytes``"""
+        return getattr(self.cache_pool, "weight", 0)
+
+    def evicted(self, key: Hashable, item: CacheItem) -> None:
+        super().evicted(key, item)
+        if self.index is not None:
+            self.index.discard(key)  # type: ignore
+
+    def size(self) -> int:
+        return len(self.cache_pool)
 
     def cache_clear(
         self, args: Optional[tuple] = None, kwargs: Optional[dict] = None
     ) -> int:
-        if args or kwargs:
+        start = time.perf_counter()
+        terms = self.make_clear_terms(args, kwargs) if self.index is not None else []
+        if terms:
+            count = 0
+            for key in self.index.pop_matches(terms):  # type: ignore
+                if self.cache_pool.pop(key, None) is not None:
+                    count += 1
+        elif args or kwargs:
             pattern = self.make_key_pattern(
                 args=args,
                 kwargs=kwargs,
@@ -66,6 +258,12 @@ class MemoryCache(BaseCache):
         else:
             count = len(self.cache_pool)
             self.cache_pool.clear()
+            if self.index is not None:
+                self.index.clear()
+            with self.deadlines_lock:
+                self.deadlines.clear()
+                self.next_deadline = math.inf
+        self.emit("clear", None, time.perf_counter() - start, count)
         return count
 
     @classmethod
@@ -87,46 +285,89 @@ class MemoryCache(BaseCache):
 class DistributedMemoryCache(DistributedCache):
     cache_pool: Dict[str, CacheItem]
 
-    def __init__(self, **kwargs):
+    def __init__(self, *, coherent: bool = False, **kwargs):
+        if kwargs.get("near_cache_limit"):
+            raise ValueError("Distributed memory cache keeps values in its own pool")
+        if any(
+            kwargs.get(name) for name in ("stale_ttl", "early_refresh", "negative_ttl")
+        ):
+            raise ValueError(
+                "Distributed memory cache cannot serve stale values, refresh early or cache negative results"
+            )
+        if kwargs.get("single_flight"):
+            raise ValueError(
+                "Distributed memory cache computes the values in each process, use MemoryCache for single flight"
+            )
         super().__init__(**kwargs)
         if self.limit == -1:
             self.cache_pool = dict()
         else:
             self.cache_pool = LRUDict(self.limit)
+        #: trust the pool until another process invalidates the key, or it expires
+        self.coherent = coherent
+        if coherent:
+            self.listen()
 
     def get(self, *args, **kwargs) -> ReturnType:
-        keyword_args, kwargs, cache_key = self.make_key(args, kwargs)
-        with self.cache_context(cache_key):
-            distributed_cache_timestamp: Optional[str] = self.client.get(cache_key)  # type: ignore
+        keyword_args, kwargs, cache_key = self.build_key(args, kwargs)
+        with self.cache_context(cache_key) as lookup:
+            if self.coherent:
+                self.listener.start()  # type: ignore
             cache_info = self.cache_pool.get(cache_key)
+            if self.coherent and cache_info is not None and self.is_fresh(cache_info):
+                return cache_info.value
+            generation = self.generation
+            distributed_cache_timestamp: Optional[str] = self.fetch(cache_key)  # type: ignore
             if distributed_cache_timestamp is None:
                 # (first call in first process) or (cache expire)
-                with self.miss_context(cache_key):
+                with lookup.miss_context(cache_key):
                     value = self.cached_function(*args, **keyword_args, **kwargs)
                     item = CacheItem(value=value, timestamp=int(time.time()))
                     self.cache_pool[cache_key] = item
-                    self.set(cache_key, item)
+                    self.set(
+                        cache_key,
+                        item,
+                        self.make_index_terms(args, {**keyword_args, **kwargs}),
+                    )
                 return value
             else:
                 cache_timestamp = int(distributed_cache_timestamp)
                 if cache_info is None:
                     # first call in other processes
                     value = self.cached_function(*args, **keyword_args, **kwargs)
-                    self.cache_pool[cache_key] = CacheItem(
-                        value=value, timestamp=cache_timestamp
-                    )
+                    # unless another process recomputed the key meanwhile
+                    if generation == self.generation:
+                        self.cache_pool[cache_key] = CacheItem(
+                            value=value, timestamp=cache_timestamp
+                        )
                     return value
                 elif cache_info.timestamp != cache_timestamp:
                     # expire by other process reset cache timestamp
-                    with self.miss_context(cache_key):
+                    with lookup.miss_context(cache_key):
                         value = self.cached_function(*args, **keyword_args, **kwargs)
-                        cache_info.value = value
-                        cache_info.timestamp = cache_timestamp
-                        return cache_info.value
+                        if generation == self.generation:
+                            cache_info.value = value
+                            cache_info.timestamp = cache_timestamp
+                        return value
                 else:
                     return cache_info.value
 
-    def set(self, key: str, value: CacheItem) -> None:
-        super().set(key, value.timestamp)
+    get_many = BaseCache.get_many
+
+    def is_fresh(self, item: CacheItem) -> bool:
+        return self.expire == -1 or time.time() < item.timestamp + self.expire
+
+    def set(self, key: str, value: CacheItem, terms: Sequence[str] = ()) -> None:  # type: ignore
+        super().set(key, value.timestamp, terms)
         self.cache_pool[key] = value
         all_cache_pool[self.namespace] = self.cache_pool
+        if self.coherent:
+            self.listener.publish(self.namespace, key)  # type: ignore
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop the pool copy of the key, or all of them if None"""
+        self.generation += 1
+        if key is None:
+            self.cache_pool.clear()
+        else:
+            self.cache_pool.pop(key, None)
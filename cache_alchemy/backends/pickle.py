@@ -1,11 +1,27 @@
-import pickle
+import sys
 
-from .base import DistributedCache, BaseCache, ReturnType
+from .base import AsyncDistributedCache, DistributedCache, BaseCache, ReturnType
+from ..codecs import decode, encode, out_of_band_codec, pickle_codec
 
 
 class DistributedPickleCache(DistributedCache, BaseCache[ReturnType]):
+    """Store values by the codec registered for their type, pickle otherwise"""
+
+    def __init__(self, *, out_of_band: bool = False, **kwargs):
+        if out_of_band and sys.version_info < (3, 8):
+            raise ValueError(
+                "Out-of-band pickling requires pickle protocol 5 of Python 3.8"
+            )
+        super().__init__(**kwargs)
+        #: pickle by protocol 5 and store large binary buffers out of the pickle stream
+        self.fallback_codec = out_of_band_codec if out_of_band else pickle_codec
+
     def serialize(self, value: ReturnType) -> bytes:
-        return pickle.dumps(value)
+        return encode(value, self.fallback_codec)
 
     def deserialize(self, result: bytes) -> ReturnType:
-        return pickle.loads(result)
+        return decode(result)
+
+
+class AsyncDistributedPickleCache(AsyncDistributedCache, DistributedPickleCache):
+    pass
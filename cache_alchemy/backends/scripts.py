@@ -0,0 +1,145 @@
+"""Lua scripts run by the distributed backends, loaded once and called by ``EVALSHA``."""
+
+#: Release the lock only if it is still held by the given token
+#: KEYS: lock key
+#: ARGV: token
+UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+#: Drop a cache key from the argument index sets it was added to
+UNINDEX_FUNCTION = """
+local function unindex(key)
+    local indexes = key .. '-indexes'
+    for _, index in ipairs(redis.call('SMEMBERS', indexes)) do
+        redis.call('SREM', index, key)
+    end
+    redis.call('DEL', indexes)
+end
+"""
+
+#: Register the namespace, evict the overflow, store the value and index its key.
+#: KEYS: backend namespace, function namespace, scores namespace, cache key,
+#:       indexes namespace, [index sets of the cache key, argument index sets...]
+#: ARGV: limit, expire, value, eviction policy, current time
+#: Return the evicted cache keys.
+SET_SCRIPT = UNINDEX_FUNCTION + """
+redis.call('SADD', KEYS[1], KEYS[2])
+local evicted = {}
+local limit = tonumber(ARGV[1])
+if limit ~= -1 and redis.call('SISMEMBER', KEYS[2], KEYS[4]) == 0 then
+    local size = redis.call('SCARD', KEYS[2])
+    if size >= limit then
+        local count = size - limit + 1
+        if ARGV[4] ~= 'random' then
+            local popped = redis.call('ZPOPMIN', KEYS[3], count)
+            for i = 1, #popped, 2 do
+                evicted[#evicted + 1] = popped[i]
+                redis.call('SREM', KEYS[2], popped[i])
+            end
+        end
+        -- keys stored before the policy was chosen are only known by the namespace
+        if #evicted < count then
+            for _, key in ipairs(redis.call('SPOP', KEYS[2], count - #evicted)) do
+                evicted[#evicted + 1] = key
+            end
+        end
+        for _, key in ipairs(evicted) do
+            redis.call('DEL', key)
+            unindex(key)
+        end
+    end
+end
+local expire = tonumber(ARGV[2])
+if expire == -1 then
+    redis.call('SET', KEYS[4], ARGV[3])
+else
+    redis.call('SET', KEYS[4], ARGV[3], 'EX', expire)
+end
+redis.call('SADD', KEYS[2], KEYS[4])
+if ARGV[4] == 'lru' then
+    redis.call('ZADD', KEYS[3], ARGV[5], KEYS[4])
+elseif ARGV[4] == 'lfu' then
+    redis.call('ZINCRBY', KEYS[3], 1, KEYS[4])
+end
+if #KEYS > 5 then
+    -- the cache key remembers its index sets, so that eviction can unindex it
+    redis.call('SADD', KEYS[5], KEYS[6])
+    for i = 7, #KEYS do
+        -- argument index sets are shared, only ever extend their TTL
+        local ttl = redis.call('TTL', KEYS[i])
+        redis.call('SADD', KEYS[5], KEYS[i])
+        redis.call('SADD', KEYS[i], KEYS[4])
+        redis.call('SADD', KEYS[6], KEYS[i])
+        if expire == -1 then
+            redis.call('PERSIST', KEYS[i])
+        elseif ttl == -2 or (ttl ~= -1 and ttl < expire) then
+            redis.call('EXPIRE', KEYS[i], expire)
+        end
+    end
+    if expire ~= -1 then
+        redis.call('EXPIRE', KEYS[6], expire)
+    end
+end
+return evicted
+"""
+
+#: Read the cache keys and refresh the scores of the hits.
+#: KEYS: scores namespace, cache keys...
+#: ARGV: eviction policy, current time
+#: Return the values in the order of the cache keys.
+GET_SCRIPT = """
+local values = {}
+for i = 2, #KEYS do
+    local value = redis.call('GET', KEYS[i])
+    values[i - 1] = value
+    if value then
+        if ARGV[1] == 'lru' then
+            redis.call('ZADD', KEYS[1], ARGV[2], KEYS[i])
+        else
+            redis.call('ZINCRBY', KEYS[1], 1, KEYS[i])
+        end
+    end
+end
+return values
+"""
+
+#: Delete one batch of the namespace keys matching a glob-style pattern.
+#: KEYS: function namespace, scores namespace
+#: ARGV: cursor, pattern, batch size
+#: Return the next cursor and the number of deleted keys.
+CLEAR_SCRIPT = """
+local result = redis.call('SSCAN', KEYS[1], ARGV[1], 'MATCH', ARGV[2], 'COUNT', ARGV[3])
+local deleted = 0
+for _, key in ipairs(result[2]) do
+    if redis.call('SREM', KEYS[1], key) == 1 then
+        deleted = deleted + 1
+        redis.call('DEL', key)
+        redis.call('ZREM', KEYS[2], key)
+    end
+end
+return {result[1], deleted}
+"""
+
+#: Delete the namespace keys indexed under all the argument index sets.
+#: KEYS: function namespace, scores namespace, argument index sets...
+#: Return the number of deleted keys.
+INDEX_CLEAR_SCRIPT = UNINDEX_FUNCTION + """
+local deleted = 0
+for _, key in ipairs(redis.call('SINTER', unpack(KEYS, 3))) do
+    if redis.call('SREM', KEYS[1], key) == 1 then
+        deleted = deleted + 1
+        redis.call('DEL', key)
+        redis.call('ZREM', KEYS[2], key)
+    end
+    unindex(key)
+    -- the index sets outlive the expired keys they hold
+    for i = 3, #KEYS do
+        redis.call('SREM', KEYS[i], key)
+    end
+end
+return deleted
+"""
@@ -0,0 +1,201 @@
+import marshal
+import pickle
+import struct
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+#: reserved tags, the first byte of the stored value
+#: - 0x00: compressed value, see :mod:`cache_alchemy.compression`
+#: - 0x01: value stored with its metadata, see :mod:`cache_alchemy.envelope`
+#: - 0x7f: cached exception, see :mod:`cache_alchemy.envelope`
+#: - 0x80: pickle, the first byte of every pickle since protocol 2
+RESERVED_TAGS = frozenset((0x00, 0x01, 0x7F, 0x80))
+
+
+class Codec(NamedTuple):
+    name: str
+    tag: bytes
+    #: dumps(value) -> tagged bytes
+    dumps: Callable[[Any], bytes]
+    #: loads(tagged bytes) -> value
+    loads: Callable[[bytes], Any]
+
+
+codecs: Dict[str, Codec] = {}
+codecs_by_tag: Dict[bytes, Codec] = {}
+codecs_by_type: Dict[type, Codec] = {}
+
+
+def add_codec(codec: Codec, types: Iterable[type] = ()) -> Codec:
+    registered = codecs_by_tag.get(codec.tag)
+    if registered is not None and registered.name != codec.name:
+        raise ValueError(
+            f"Tag {codec.tag!r} is already registered by {registered.name}"
+        )
+    codecs[codec.name] = codecs_by_tag[codec.tag] = codec
+    for type_ in types:
+        codecs_by_type[type_] = codec
+    return codec
+
+
+def register_codec(
+    name: str,
+    tag: int,
+    types: Iterable[type],
+    encode: Callable[[Any], bytes],
+    decode: Callable[[memoryview], Any],
+) -> Codec:
+    """Register a codec for the values of exactly these types.
+
+    ``encode`` returns the payload stored after the one-byte tag, ``decode`` gets it back
+    as a memoryview. The tag identifies the codec of stored values, it must not change once used.
+    Raise :class:`ValueError` from ``encode`` to fall back to pickle.
+    """
+    if not 0 <= tag <= 255 or tag in RESERVED_TAGS:
+        raise ValueError(
+            f"Expected tag to be a byte other than {sorted(RESERVED_TAGS)}"
+        )
+    prefix = bytes((tag,))
+    return add_codec(
+        Codec(
+            name,
+            prefix,
+            lambda value: prefix + encode(value),
+            lambda data: decode(memoryview(data)[1:]),
+        ),
+        types,
+    )
+
+
+def encode(value: Any, fallback: Optional[Codec] = None) -> bytes:
+    """Encode the value by the codec of its type, or the fallback codec, pickle by default"""
+    codec = codecs_by_type.get(type(value))
+    if codec is not None:
+        try:
+            return codec.dumps(value)
+        except ValueError:
+            pass
+    return (fallback or pickle_codec).dumps(value)
+
+
+def decode(data: bytes) -> Any:
+    try:
+        codec = codecs_by_tag[data[:1]]
+    except KeyError:
+        raise ValueError(f"Unknown codec tag {data[:1]!r}") from None
+    return codec.loads(data)
+
+
+pickle_codec = add_codec(Codec("pickle", b"\x80", pickle.dumps, pickle.loads))
+
+OUT_OF_BAND_TAG = b"\x06"
+#: count of the buffers and length of the pickle frame, followed by the length of each buffer
+_out_of_band_header = struct.Struct("<IQ")
+
+
+class _OutOfBandByteArray:
+    """Pickled as a ``bytearray`` of an out-of-band buffer, the pickler keeps ``bytearray`` in band"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytearray):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        return bytearray, (pickle.PickleBuffer(self.data),)
+
+
+def dumps_out_of_band(value: Any) -> bytes:
+    """Pickle by protocol 5, store the out-of-band buffers after the frame as they are.
+
+    Buffers are passed out of band by ``PickleBuffer`` and the objects reducing to it, such as
+    NumPy arrays, and by a ``bytearray`` value. Without any, the frame is stored as a plain pickle.
+    """
+    buffers: List[pickle.PickleBuffer] = []
+    if type(value) is bytearray:
+        value = _OutOfBandByteArray(value)
+    frame = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+    if not buffers:
+        return frame
+    views = []
+    for buffer in buffers:
+        try:
+            views.append(buffer.raw())
+        except BufferError:
+            # not contiguous
+            views.append(memoryview(memoryview(buffer).tobytes()))
+    return b"".join(
+        [
+            OUT_OF_BAND_TAG,
+            _out_of_band_header.pack(len(views), len(frame)),
+            struct.pack(f"<{len(views)}Q", *(view.nbytes for view in views)),
+            frame,
+            *views,
+        ]
+    )
+
+
+def loads_out_of_band(data: bytes) -> Any:
+    """Rebuild the value from views of the data, the buffers are not copied.
+
+    The views are read-only, so are the arrays rebuilt from them.
+    """
+    view = memoryview(data)
+    count, frame_length = _out_of_band_header.unpack_from(view, 1)
+    offset = 1 + _out_of_band_header.size
+    lengths = struct.unpack_from(f"<{count}Q", view, offset)
+    offset += 8 * count
+    frame = view[offset : offset + frame_length]
+    offset += frame_length
+    buffers = []
+    for length in lengths:
+        buffers.append(view[offset : offset + length])
+        offset += length
+    return pickle.loads(frame, buffers=buffers)
+
+
+#: fallback codec of ``out_of_band=True``, large binary buffers skip the pickle stream
+out_of_band_codec = add_codec(
+    Codec("pickle-out-of-band", OUT_OF_BAND_TAG, dumps_out_of_band, loads_out_of_band)
+)
+register_codec("bytes", 0x02, (bytes,), lambda value: value, bytes)
+register_codec("str", 0x03, (str,), str.encode, lambda data: str(data, "utf-8"))
+register_codec(
+    "int", 0x04, (int,), lambda value: b"%d" % value, lambda data: int(bytes(data))
+)
+_marshal_containers = (list, tuple, set, frozenset)
+_marshal_scalars = frozenset((str, bytes, int, float, complex, bool, type(None)))
+
+
+def dumps_marshal(value: Any) -> bytes:
+    """Raise ValueError unless the value only holds builtin values of exact types.
+
+    marshal dumps any buffer, such as ``bytearray`` or an array, as ``bytes``.
+    """
+    stack = [value]
+    seen = set()
+    while stack:
+        item = stack.pop()
+        type_ = type(item)
+        if type_ in _marshal_scalars:
+            continue
+        if id(item) in seen:
+            continue
+        if type_ in _marshal_containers:
+            stack.extend(item)
+        elif type_ is dict:
+            stack.extend(item)
+            stack.extend(item.values())
+        else:
+            raise ValueError(f"Unexpected {type_} for marshal")
+        seen.add(id(item))
+    return marshal.dumps(value)
+
+
+#: marshal only dumps builtin values, others raise ValueError and fall back to pickle
+register_codec(
+    "marshal",
+    0x05,
+    (list, tuple, dict, set, frozenset, float, complex, bool, type(None)),
+    dumps_marshal,
+    marshal.loads,
+)
@@ -0,0 +1,76 @@
+import lzma
+import zlib
+from typing import Callable, Dict, NamedTuple, Optional
+
+#: first byte of a compressed value, never the first byte of a json or pickle value
+COMPRESSED_TAG = b"\x00"
+
+
+class Compressor(NamedTuple):
+    name: str
+    #: one byte following the compressed tag, identify the compressor of a stored value
+    tag: bytes
+    #: compress(data, level) -> compressed data, level is None for the default level
+    compress: Callable[[bytes, Optional[int]], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+compressors: Dict[str, Compressor] = {}
+compressors_by_tag: Dict[bytes, Compressor] = {}
+
+
+def register_compressor(
+    name: str,
+    tag: int,
+    compress: Callable[[bytes, Optional[int]], bytes],
+    decompress: Callable[[bytes], bytes],
+) -> Compressor:
+    """Register a compressor to be used by ``compression=name``.
+
+    The tag is stored with every value it compresses, it must not change once used.
+    """
+    if not 0 <= tag <= 255:
+        raise ValueError("Expected tag to be a byte")
+    compressor = Compressor(name, bytes((tag,)), compress, decompress)
+    registered = compressors_by_tag.get(compressor.tag)
+    if registered is not None and registered.name != name:
+        raise ValueError(f"Tag {tag} is already registered by {registered.name}")
+    compressors[name] = compressors_by_tag[compressor.tag] = compressor
+    return compressor
+
+
+def get_compressor(name: str) -> Compressor:
+    try:
+        return compressors[name]
+    except KeyError:
+        raise ValueError(
+            f"Expected compression to be one of {tuple(compressors)}"
+        ) from None
+
+
+def compress(data: bytes, compressor: Compressor, level: Optional[int] = None) -> bytes:
+    """Tag the compressed data, or return the data as is if it does not shrink"""
+    compressed = COMPRESSED_TAG + compressor.tag + compressor.compress(data, level)
+    return compressed if len(compressed) < len(data) else data
+
+
+def decompress(data: bytes) -> bytes:
+    """Decompress tagged data, return untagged data as is"""
+    if data[:1] != COMPRESSED_TAG:
+        return data
+    try:
+        compressor = compressors_by_tag[data[1:2]]
+    except KeyError:
+        raise ValueError(f"Unknown compressor tag {data[1:2]!r}") from None
+    return compressor.decompress(memoryview(data)[2:])  # type: ignore
+
+
+register_compressor(
+    "zlib",
+    1,
+    lambda data, level: zlib.compress(data, -1 if level is None else level),
+    zlib.decompress,
+)
+register_compressor(
+    "lzma", 2, lambda data, level: lzma.compress(data, preset=level), lzma.decompress
+)
@@ -5,6 +5,7 @@ from configalchemy import BaseConfig
 
 if TYPE_CHECKING:  # pragma: no cover
     from redis import Redis
+    from redis.asyncio import Redis as AsyncRedis
 
 _current_config_ref = ref(object)
 
@@ -18,6 +19,14 @@ class DefaultConfig(BaseConfig):
     CACHE_ALCHEMY_PICKLE_BACKEND = (
         "cache_alchemy.backends.pickle.DistributedPickleCache"
     )
+    #: async distributed json cache backend - need assign async client to config
+    CACHE_ALCHEMY_ASYNC_JSON_BACKEND = (
+        "cache_alchemy.backends.json.AsyncDistributedJsonCache"
+    )
+    #: async distributed pickle cache backend - need assign async client to config
+    CACHE_ALCHEMY_ASYNC_PICKLE_BACKEND = (
+        "cache_alchemy.backends.pickle.AsyncDistributedPickleCache"
+    )
     #: memory cache backend - default: distributed cache which need assign client to config
     CACHE_ALCHEMY_MEMORY_BACKEND = (
         "cache_alchemy.backends.memory.DistributedMemoryCache"
@@ -34,6 +43,8 @@ class DefaultConfig(BaseConfig):
 
     #: Need to be assigned after init, if use distributed cache
     cache_redis_client: "Redis"
+    #: Need to be assigned after init, if use async distributed cache
+    cache_async_redis_client: "AsyncRedis"
 
     def __init__(self):
         super().__init__()
@@ -1,7 +1,9 @@
+import inspect
 from typing import Dict, Hashable, List, Set, Optional
 from weakref import WeakSet
 
 from .backends.base import BaseCache, CacheFunctionType
+from .utils import UnsupportedError
 
 
 class CacheDependency:
@@ -29,7 +31,27 @@ class CacheDependency:
         count = 0
         for dependency in cls.find_dependencies(ident):
             for cache in dependency.cache_objects:
-                count += cache.cache_clear(args, kwargs)
+                result = cache.cache_clear(args, kwargs)
+                if inspect.isawaitable(result):
+                    result.close()  # type: ignore
+                    raise UnsupportedError("async cache can only depend on async cache")
+                count += result
+        return count
+
+    @classmethod
+    async def async_dependent_cache_clear(
+        cls,
+        ident: Hashable,
+        args: Optional[tuple] = None,
+        kwargs: Optional[dict] = None,
+    ) -> int:
+        count = 0
+        for dependency in cls.find_dependencies(ident):
+            for cache in dependency.cache_objects:
+                result = cache.cache_clear(args, kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                count += result
         return count
 
 
@@ -0,0 +1,53 @@
+import pickle
+import struct
+from typing import NamedTuple, Optional, Tuple
+
+#: first byte of a value stored with its metadata, never the first byte of
+#: a json, pickle, codec or compressed value
+ENVELOPE_TAG = b"\x01"
+_envelope = struct.Struct("<dd")
+
+
+class Envelope(NamedTuple):
+    #: wall-clock time the value is fresh until
+    fresh_until: float
+    #: seconds the computation of the value took
+    delta: float = 0.0
+
+
+def wrap(data: bytes, envelope: Envelope) -> bytes:
+    return ENVELOPE_TAG + _envelope.pack(*envelope) + data
+
+
+def unwrap(data: bytes) -> Tuple[Optional[Envelope], bytes]:
+    """Return the metadata and the value, None for a value stored without it"""
+    if data[:1] != ENVELOPE_TAG:
+        return None, data
+    return Envelope(*_envelope.unpack_from(data, 1)), data[1 + _envelope.size :]
+
+
+#: first byte of a raised exception stored in place of the value
+ERROR_TAG = b"\x7f"
+
+
+class CachedError:
+    """An exception cached in place of the value, raised again by every hit"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def dump_error(error: BaseException) -> Optional[bytes]:
+    """Pickle the exception, None if it cannot be loaded back"""
+    try:
+        data = pickle.dumps(error)
+        pickle.loads(data)
+    except Exception:
+        return None
+    return ERROR_TAG + data
+
+
+def load_error(data: bytes) -> BaseException:
+    return pickle.loads(memoryview(data)[1:])
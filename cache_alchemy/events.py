@@ -0,0 +1,87 @@
+import logging
+import time
+from typing import TYPE_CHECKING, Callable, Hashable, List, NamedTuple, Optional
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .backends.base import BaseCache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEvent(NamedTuple):
+    #: hit, miss, set, evict or clear
+    name: str
+    namespace: str
+    #: None for the clears
+    key: Optional[Hashable]
+    #: seconds the operation took, 0 for the evictions,
+    #: the whole batch for the lookups and writes of ``get_many``
+    duration: float
+    #: keys removed by a clear, 1 otherwise
+    items: int = 1
+
+
+Listener = Callable[[CacheEvent], None]
+
+#: listeners notified by every cache, on top of the ``listeners`` of each cache
+listeners: List[Listener] = []
+
+
+def add_listener(listener: Listener) -> None:
+    listeners.append(listener)
+
+
+def remove_listener(listener: Listener) -> None:
+    listeners.remove(listener)
+
+
+def notify(cache_listeners: List[Listener], event: CacheEvent) -> None:
+    """Call the listeners of the cache then the global ones, a failing listener
+    is logged and never fails the cache.
+    """
+    for listener in (*cache_listeners, *listeners):
+        try:
+            listener(event)
+        except Exception:
+            logger.exception("Failed to notify %r of %r", listener, event)
+
+
+class EventContext:
+    """Time an operation of a cache and notify the listeners once it succeeds.
+
+    Only built while a listener is registered, the caches use themselves
+    as a context doing nothing otherwise.
+    """
+
+    __slots__ = ("cache", "name", "key", "start")
+
+    def __init__(self, cache: "BaseCache", name: str, key: Hashable):
+        self.cache = cache
+        self.name = name
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.cache.emit(self.name, self.key, time.perf_counter() - self.start)
+
+
+class LookupContext(EventContext):
+    """Time a lookup and notify the listeners of a hit, or of a miss once
+    :meth:`miss_context` is entered, even if computing the value fails.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, cache: "BaseCache", key: Hashable):
+        super().__init__(cache, "hit", key)
+
+    def miss_context(self, key: str):
+        self.name = "miss"
+        return self.cache.miss_context(key)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cache.emit(self.name, self.key, time.perf_counter() - self.start)
@@ -0,0 +1,461 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Type
+
+from .lru import LRUDict
+
+#: returned by a policy admitting a key without evicting another one
+_nothing = object()
+_empty = object()
+
+
+class EvictionDict(dict):
+    """Bounded dict dropping the key chosen by the eviction policy of the subclass.
+
+    Values are stored in the dict itself, the subclass only keeps the order of the keys.
+    """
+
+    __slots__ = ("max_size", "lock", "on_evict", "__weakref__")
+
+    def __init__(
+        self,
+        max_size: int,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        if max_size <= 0:
+            raise ValueError("Expected max_size to be larger than 0")
+        self.max_size = max_size
+        self.lock = Lock()
+        #: called with the key and value dropped to make room, out of the lock
+        self.on_evict = on_evict
+        super().__init__()
+
+    @property
+    def full(self) -> bool:
+        return len(self) >= self.max_size
+
+    def __setitem__(self, key, value):
+        evicted = None
+        with self.lock:
+            if key in self:
+                super().__setitem__(key, value)
+                self.touch(key)
+            else:
+                victim = self.admit(key)
+                if victim is not _nothing:
+                    evicted = (victim, super().pop(victim))
+                super().__setitem__(key, value)
+        if evicted is not None and self.on_evict is not None:
+            self.on_evict(*evicted)
+
+    def __getitem__(self, key):
+        with self.lock:
+            value = super().__getitem__(key)
+            self.touch(key)
+            return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def peek(self, key, default=None):
+        """Read the value without recording an access of the key"""
+        return dict.get(self, key, default)
+
+    def remove(self, key, value) -> bool:
+        """Remove the key only if it still holds the value, return whether it did"""
+        with self.lock:
+            if dict.get(self, key) is not value:
+                return False
+            super().__delitem__(key)
+            self.discard(key)
+            return True
+
+    def __delitem__(self, key):
+        with self.lock:
+            super().__delitem__(key)
+            self.discard(key)
+
+    def pop(self, key, *default):
+        with self.lock:
+            try:
+                value = super().pop(key)
+            except KeyError:
+                if default:
+                    return default[0]
+                raise
+            self.discard(key)
+            return value
+
+    def clear(self):
+        with self.lock:
+            super().clear()
+            self.reset()
+
+    def admit(self, key: Hashable) -> Any:
+        """Record a new key, return the key to drop if full, ``_nothing`` otherwise"""
+        raise NotImplementedError  # pragma: no cover
+
+    def touch(self, key: Hashable) -> None:
+        """Record a read or an update of the key"""
+
+    def discard(self, key: Hashable) -> None:
+        """Forget the key removed by the user"""
+        raise NotImplementedError  # pragma: no cover
+
+    def reset(self) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+
+class FIFODict(EvictionDict):
+    """Drop the oldest key, whatever its reads"""
+
+    __slots__ = ("order",)
+
+    def __init__(self, max_size: int, on_evict=None):
+        super().__init__(max_size, on_evict)
+        self.order: Dict[Hashable, None] = OrderedDict()
+
+    def admit(self, key):
+        victim = _nothing
+        if self.full:
+            victim = self.order.popitem(last=False)[0]
+        self.order[key] = None
+        return victim
+
+    def discard(self, key):
+        self.order.pop(key, None)
+
+    def reset(self):
+        self.order.clear()
+
+
+class LFUDict(EvictionDict):
+    """Drop the least frequently read key, the oldest one of the same frequency"""
+
+    __slots__ = ("counts", "buckets", "min_count")
+
+    def __init__(self, max_size: int, on_evict=None):
+        super().__init__(max_size, on_evict)
+        self.counts: Dict[Hashable, int] = {}
+        #: count -> keys read as often, oldest first
+        self.buckets: Dict[int, Dict[Hashable, None]] = {}
+        self.min_count = 0
+
+    def admit(self, key):
+        victim = _nothing
+        if self.full:
+            bucket = self.buckets[self.min_count]
+            victim = next(iter(bucket))
+            self._remove(victim)
+        self.counts[key] = 1
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_count = 1
+        return victim
+
+    def touch(self, key):
+        count = self.counts[key]
+        self._remove(key)
+        if count == self.min_count and count not in self.buckets:
+            self.min_count = count + 1
+        self.counts[key] = count + 1
+        self.buckets.setdefault(count + 1, OrderedDict())[key] = None
+
+    def discard(self, key):
+        count = self.counts.get(key)
+        if count is not None:
+            self._remove(key)
+            if count == self.min_count and self.buckets:
+                self.min_count = min(self.buckets)
+
+    def reset(self):
+        self.counts.clear()
+        self.buckets.clear()
+        self.min_count = 0
+
+    def _remove(self, key):
+        count = self.counts.pop(key)
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+
+
+class ClockDict(EvictionDict):
+    """Second chance: the hand skips and clears the keys read since it last passed"""
+
+    __slots__ = ("ring", "slots", "referenced", "free", "hand")
+
+    def __init__(self, max_size: int, on_evict=None):
+        super().__init__(max_size, on_evict)
+        self.ring: List[Any] = []
+        self.slots: Dict[Hashable, int] = {}
+        self.referenced: Dict[Hashable, bool] = {}
+        self.free: List[int] = []
+        self.hand = 0
+
+    def admit(self, key):
+        victim = _nothing
+        if self.full:
+            while True:
+                candidate = self.ring[self.hand]
+                if candidate is not _empty:
+                    if not self.referenced[candidate]:
+                        break
+                    self.referenced[candidate] = False
+                self.hand = (self.hand + 1) % len(self.ring)
+            victim = candidate
+            self.discard(victim)
+            self.hand = (self.hand + 1) % len(self.ring)
+        if self.free:
+            slot = self.free.pop()
+            self.ring[slot] = key
+        else:
+            slot = len(self.ring)
+            self.ring.append(key)
+        self.slots[key] = slot
+        self.referenced[key] = False
+        return victim
+
+    def touch(self, key):
+        self.referenced[key] = True
+
+    def discard(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            del self.referenced[key]
+            self.ring[slot] = _empty
+            self.free.append(slot)
+
+    def reset(self):
+        self.ring.clear()
+        self.slots.clear()
+        self.referenced.clear()
+        self.free.clear()
+        self.hand = 0
+
+
+class ARCDict(EvictionDict):
+    """Adaptive replacement cache, scan resistant.
+
+    Keys read once live in ``recent``, keys read again in ``frequent``. The ghosts remember
+    the keys recently dropped from each, a new key found in a ghost list moves the target size
+    of ``recent`` towards the list which would have kept it.
+    """
+
+    __slots__ = ("recent", "frequent", "recent_ghosts", "frequent_ghosts", "target")
+
+    def __init__(self, max_size: int, on_evict=None):
+        super().__init__(max_size, on_evict)
+        self.recent: Dict[Hashable, None] = OrderedDict()
+        self.frequent: Dict[Hashable, None] = OrderedDict()
+        self.recent_ghosts: Dict[Hashable, None] = OrderedDict()
+        self.frequent_ghosts: Dict[Hashable, None] = OrderedDict()
+        #: target size of ``recent``
+        self.target = 0.0
+
+    def admit(self, key):
+        victim = _nothing
+        size = self.max_size
+        if key in self.recent_ghosts:
+            ratio = len(self.frequent_ghosts) / len(self.recent_ghosts)
+            self.target = min(size, self.target + max(ratio, 1))
+            del self.recent_ghosts[key]
+            if self.full:
+                victim = self._replace(in_frequent_ghosts=False)
+            self.frequent[key] = None
+            return victim
+        if key in self.frequent_ghosts:
+            ratio = len(self.recent_ghosts) / len(self.frequent_ghosts)
+            self.target = max(0, self.target - max(ratio, 1))
+            del self.frequent_ghosts[key]
+            if self.full:
+                victim = self._replace(in_frequent_ghosts=True)
+            self.frequent[key] = None
+            return victim
+        if len(self.recent) + len(self.recent_ghosts) >= size:
+            if len(self.recent) < size:
+                self.recent_ghosts.popitem(last=False)
+                if self.full:
+                    victim = self._replace(in_frequent_ghosts=False)
+            else:
+                victim = self.recent.popitem(last=False)[0]
+        else:
+            ghosts = len(self.recent_ghosts) + len(self.frequent_ghosts)
+            if len(self) + ghosts >= size:
+                if len(self) + ghosts >= 2 * size:
+                    self.frequent_ghosts.popitem(last=False)
+                if self.full:
+                    victim = self._replace(in_frequent_ghosts=False)
+        self.recent[key] = None
+        return victim
+
+    def touch(self, key):
+        if key in self.recent:
+            del self.recent[key]
+            self.frequent[key] = None
+        else:
+            self.frequent.move_to_end(key)  # type: ignore
+
+    def discard(self, key):
+        self.recent.pop(key, None)
+        self.frequent.pop(key, None)
+
+    def reset(self):
+        self.recent.clear()
+        self.frequent.clear()
+        self.recent_ghosts.clear()
+        self.frequent_ghosts.clear()
+        self.target = 0.0
+
+    def _replace(self, in_frequent_ghosts: bool) -> Hashable:
+        if self.recent and (
+            len(self.recent) > self.target
+            or (in_frequent_ghosts and len(self.recent) == self.target)
+            or not self.frequent
+        ):
+            victim = self.recent.popitem(last=False)[0]  # type: ignore
+            self.recent_ghosts[victim] = None
+        else:
+            victim = self.frequent.popitem(last=False)[0]  # type: ignore
+            self.frequent_ghosts[victim] = None
+        return victim
+
+
+class FrequencySketch:
+    """Count-min sketch of 4 bit counters, halved as the samples reach ten times the size"""
+
+    __slots__ = ("table", "shift", "samples", "sample_size")
+
+    #: odd multipliers of the four hash functions
+    seeds = (
+        0x9E3779B97F4A7C15,
+        0xC2B2AE3D27D4EB4F,
+        0x165667B19E3779F9,
+        0xD6E8FEB86659FD93,
+    )
+    mask = (1 << 64) - 1
+
+    def __init__(self, size: int):
+        bits = max(4, (size - 1).bit_length())
+        self.table = [0] * (1 << bits)
+        self.shift = 64 - bits
+        self.samples = 0
+        self.sample_size = 10 * size
+
+    def indexes(self, key: Hashable) -> List[int]:
+        hashed = hash(key) & self.mask
+        return [((hashed * seed) & self.mask) >> self.shift for seed in self.seeds]
+
+    def frequency(self, key: Hashable) -> int:
+        table = self.table
+        return min(table[index] for index in self.indexes(key))
+
+    def increment(self, key: Hashable) -> None:
+        table = self.table
+        for index in self.indexes(key):
+            if table[index] < 15:
+                table[index] += 1
+        self.samples += 1
+        if self.samples >= self.sample_size:
+            self.table = [count >> 1 for count in table]
+            self.samples //= 2
+
+    def clear(self) -> None:
+        self.table = [0] * len(self.table)
+        self.samples = 0
+
+
+class TinyLFUDict(EvictionDict):
+    """Window TinyLFU: a small LRU window in front of a segmented LRU guarded by frequency.
+
+    A key leaving the window only replaces the oldest probation key if it has been read
+    more often, so keys read once by a scan do not flush the keys read often.
+    """
+
+    __slots__ = (
+        "window",
+        "probation",
+        "protected",
+        "window_size",
+        "protected_size",
+        "sketch",
+    )
+
+    #: share of the window and of the protected segment
+    window_ratio = 0.01
+    protected_ratio = 0.8
+
+    def __init__(self, max_size: int, on_evict=None):
+        super().__init__(max_size, on_evict)
+        self.window: Dict[Hashable, None] = OrderedDict()
+        self.probation: Dict[Hashable, None] = OrderedDict()
+        self.protected: Dict[Hashable, None] = OrderedDict()
+        self.window_size = max(1, int(max_size * self.window_ratio))
+        self.protected_size = int((max_size - self.window_size) * self.protected_ratio)
+        self.sketch = FrequencySketch(max_size)
+
+    def admit(self, key):
+        self.sketch.increment(key)
+        self.window[key] = None
+        if len(self.window) <= self.window_size:
+            return _nothing
+        candidate = self.window.popitem(last=False)[0]  # type: ignore
+        if len(self.probation) + len(self.protected) < self.max_size - self.window_size:
+            self.probation[candidate] = None
+            return _nothing
+        main = self.probation or self.protected
+        if not main:
+            # a cache of a single key has no room behind the window
+            return candidate
+        victim = next(iter(main))
+        if self.sketch.frequency(candidate) <= self.sketch.frequency(victim):
+            return candidate
+        del main[victim]
+        self.probation[candidate] = None
+        return victim
+
+    def touch(self, key):
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)  # type: ignore
+        elif key in self.probation:
+            del self.probation[key]
+            self.protected[key] = None
+            if len(self.protected) > self.protected_size:
+                demoted = self.protected.popitem(last=False)[0]  # type: ignore
+                self.probation[demoted] = None
+        else:
+            self.protected.move_to_end(key)  # type: ignore
+
+    def discard(self, key):
+        self.window.pop(key, None)
+        self.probation.pop(key, None)
+        self.protected.pop(key, None)
+
+    def reset(self):
+        self.window.clear()
+        self.probation.clear()
+        self.protected.clear()
+        self.sketch.clear()
+
+
+eviction_dicts: Dict[str, Type[dict]] = {
+    "lru": LRUDict,
+    "fifo": FIFODict,
+    "lfu": LFUDict,
+    "clock": ClockDict,
+    "arc": ARCDict,
+    "tinylfu": TinyLFUDict,
+}
+
+
+def get_eviction_dict(name: str) -> Type[dict]:
+    try:
+        return eviction_dicts[name]
+    except KeyError:
+        raise ValueError(
+            f"Expected eviction to be one of {tuple(eviction_dicts)}"
+        ) from None
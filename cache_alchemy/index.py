@@ -0,0 +1,54 @@
+from threading import Lock
+from typing import Dict, Iterable, Sequence, Set, Tuple
+
+
+class ArgumentIndex:
+    """Inverted index from ``name=repr(value)`` terms to the cache keys holding them.
+
+    A partial clear looks up the keys of every given term and intersects them,
+    so it costs as much as the matching keys rather than the whole cache.
+    """
+
+    __slots__ = ("lock", "keys", "terms")
+
+    def __init__(self):
+        self.lock = Lock()
+        #: term -> cache keys called with it
+        self.keys: Dict[str, Set[str]] = {}
+        #: cache key -> terms of its call
+        self.terms: Dict[str, Tuple[str, ...]] = {}
+
+    def __len__(self):
+        return len(self.terms)
+
+    def add(self, key: str, terms: Iterable[str]) -> None:
+        with self.lock:
+            if key in self.terms:
+                return
+            self.terms[key] = tuple(terms)
+            for term in self.terms[key]:
+                self.keys.setdefault(term, set()).add(key)
+
+    def discard(self, key: str) -> None:
+        with self.lock:
+            self._discard(key)
+
+    def pop_matches(self, terms: Sequence[str]) -> Set[str]:
+        """Remove and return the keys indexed under all the terms"""
+        with self.lock:
+            matches = set.intersection(*(self.keys.get(term, set()) for term in terms))
+            for key in matches:
+                self._discard(key)
+            return matches
+
+    def clear(self) -> None:
+        with self.lock:
+            self.keys.clear()
+            self.terms.clear()
+
+    def _discard(self, key: str) -> None:
+        for term in self.terms.pop(key, ()):
+            keys = self.keys[term]
+            keys.discard(key)
+            if not keys:
+                del self.keys[term]
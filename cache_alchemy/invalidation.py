@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+from weakref import WeakKeyDictionary, WeakMethod
+
+#: Redis pub/sub channel every process publishes its invalidations to
+INVALIDATION_CHANNEL = "cache-alchemy:invalidation"
+
+logger = logging.getLogger(__name__)
+
+InvalidationHandler = Callable[[Optional[str]], None]
+
+
+def encode_invalidation(token: str, namespace: str, key: Optional[str]) -> bytes:
+    """An empty key invalidates the whole namespace"""
+    return f"{token}\n{namespace}\n{key or ''}".encode()
+
+
+def decode_invalidation(data: bytes) -> Tuple[str, str, Optional[str]]:
+    token, namespace, key = data.decode().split("\n", 2)
+    return token, namespace, key or None
+
+
+class BaseInvalidationListener:
+    """Dispatch the invalidations published by other processes to the caches of a namespace.
+
+    Handlers are held by weak references, so a listener never keeps a cache alive.
+    The invalidations published by this listener are ignored when they come back.
+    """
+
+    listeners: "WeakKeyDictionary[Any, BaseInvalidationListener]"
+    listeners_lock = Lock()
+
+    def __init__(self, client):
+        self.client = client
+        self.token = uuid4().hex
+        self.lock = Lock()
+        self.handlers: Dict[str, List[WeakMethod]] = {}
+
+    def register(self, namespace: str, handler: InvalidationHandler) -> None:
+        with self.lock:
+            handlers = self.handlers.setdefault(namespace, [])
+            handlers[:] = [ref for ref in handlers if ref() is not None]
+            handlers.append(WeakMethod(handler))  # type: ignore
+
+    def dispatch(self, namespace: str, key: Optional[str]) -> None:
+        with self.lock:
+            handlers = [ref() for ref in self.handlers.get(namespace, [])]
+        for handler in handlers:
+            if handler is not None:
+                handler(key)
+
+    def dispatch_all(self) -> None:
+        """Invalidate every namespace, the invalidations published meanwhile may be lost"""
+        with self.lock:
+            namespaces = list(self.handlers)
+        for namespace in namespaces:
+            self.dispatch(namespace, None)
+
+    def handle(self, message: Dict[str, Any]) -> None:
+        token, namespace, key = decode_invalidation(message["data"])
+        if token != self.token:
+            self.dispatch(namespace, key)
+
+
+class InvalidationListener(BaseInvalidationListener):
+    """Listen to the invalidation channel of a Redis client in a daemon thread"""
+
+    listeners = WeakKeyDictionary()
+    #: seconds the listening thread blocks waiting for a message
+    poll_timeout = 1.0
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.start_lock = Lock()
+        #: process running the thread, a forked process inherits neither
+        self.pid = 0
+        self.start()
+
+    def start(self) -> None:
+        """Start listening in a thread, again in a process forked since"""
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with self.start_lock:
+            if self.pid == pid:
+                return
+            if self.pid:
+                # the thread and the connection belong to the parent, which shares the token
+                self.token = uuid4().hex
+                self.dispatch_all()
+            self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self.pubsub.subscribe(**{INVALIDATION_CHANNEL: self.handle})
+            self.thread = self.pubsub.run_in_thread(
+                sleep_time=self.poll_timeout,
+                daemon=True,
+                exception_handler=self.handle_exception,
+            )
+            self.pid = pid
+
+    def handle_exception(self, error: BaseException, pubsub, thread) -> None:
+        """Keep the thread listening after an error"""
+        logger.error("Failed to listen to the invalidations", exc_info=error)
+        self.dispatch_all()
+
+    @classmethod
+    def get_listener(cls, client) -> "InvalidationListener":
+        """The listener shared by all the caches of the client"""
+        with cls.listeners_lock:
+            listener = cls.listeners.get(client)
+            if listener is None:
+                listener = cls.listeners[client] = cls(client)
+            return listener  # type: ignore
+
+    def publish(self, namespace: str, key: Optional[str] = None) -> None:
+        self.start()
+        self.client.publish(
+            INVALIDATION_CHANNEL, encode_invalidation(self.token, namespace, key)
+        )
+
+
+class AsyncInvalidationListener(BaseInvalidationListener):
+    """Listen to the invalidation channel of a ``redis.asyncio`` client in a task"""
+
+    listeners = WeakKeyDictionary()
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self.task: Optional[asyncio.Future] = None
+        #: loop running the task
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def get_listener(cls, client) -> "AsyncInvalidationListener":
+        """The listener shared by all the caches of the client"""
+        with cls.listeners_lock:
+            listener = cls.listeners.get(client)
+            if listener is None:
+                listener = cls.listeners[client] = cls(client)
+            return listener  # type: ignore
+
+    def start(self) -> None:
+        """Start listening in the running loop, again once the task failed or its loop closed"""
+        loop = asyncio.get_event_loop()
+        task = self.task
+        if task is not None and not task.done() and self.loop is loop:
+            return
+        if task is not None:
+            # the connection may belong to the closed loop
+            self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self.dispatch_all()
+        self.loop = loop
+        self.task = asyncio.ensure_future(self.listen())
+
+    async def listen(self) -> None:
+        try:
+            await self.pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in self.pubsub.listen():
+                self.handle(message)
+        except Exception:
+            logger.exception("Failed to listen to the invalidations")
+            self.dispatch_all()
+            # release the connection, redis-py < 5 names it reset
+            await getattr(self.pubsub, "aclose", self.pubsub.reset)()
+
+    async def publish(self, namespace: str, key: Optional[str] = None) -> None:  # type: ignore
+        await self.client.publish(
+            INVALIDATION_CHANNEL, encode_invalidation(self.token, namespace, key)
+        )
@@ -1,17 +1,81 @@
+import sys
 from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
 
 from cache_alchemy.link import DoublyLinkedListNode
 
+_containers = (list, tuple, set, frozenset)
+
+
+def sizeof(value: Any) -> int:
+    """Estimate the bytes of the value, with the items of builtin containers.
+
+    Other objects count as much as their ``__sizeof__``, such as the data of NumPy arrays
+    and pandas objects, plus their ``__dict__`` and the attributes in it, without
+    following the attributes further, so that a reference to a module, a logger or
+    a session is not weighed with everything it reaches.
+    """
+    size = 0
+    stack = [value]
+    seen = set()
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, _containers):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            stack.extend(item)
+            stack.extend(item.values())
+        elif not isinstance(item, type):
+            attributes = getattr(item, "__dict__", None)
+            if isinstance(attributes, dict) and id(attributes) not in seen:
+                seen.add(id(attributes))
+                size += sys.getsizeof(attributes)
+                for attribute in attributes.values():
+                    if id(attribute) not in seen:
+                        seen.add(id(attribute))
+                        size += sys.getsizeof(attribute)
+    return size
+
 
 class LRUDict(dict):
-    __slots__ = ("max_size", "root", "lock", "__weakref__")
+    __slots__ = (
+        "max_size",
+        "root",
+        "lock",
+        "on_evict",
+        "weigher",
+        "max_weight",
+        "weights",
+        "weight",
+        "__weakref__",
+    )
 
-    def __init__(self, max_size: int):
+    def __init__(
+        self,
+        max_size: float,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        weigher: Optional[Callable[[Any], int]] = None,
+        max_weight: Optional[int] = None,
+    ):
         if max_size <= 0:
             raise ValueError("Expected max_size to be larger than 0")
+        if max_weight is not None and (weigher is None or max_weight <= 0):
+            raise ValueError("Expected a weigher and max_weight to be larger than 0")
         self.max_size = max_size
         self.root = DoublyLinkedListNode()
         self.lock = Lock()
+        #: called with the key and value dropped to make room, out of the lock
+        self.on_evict = on_evict
+        #: evict the least recently used values until their total weight fits max_weight
+        self.weigher = weigher
+        self.max_weight = max_weight
+        self.weights: Dict[Hashable, int] = {}
+        #: total weight of the values
+        self.weight = 0
         super().__init__()
 
     @property
@@ -19,13 +83,17 @@ class LRUDict(dict):
         return len(self) >= self.max_size
 
     def __setitem__(self, key, value):
+        if self.weigher is not None:
+            self.set_weighted(key, value, self.weigher(value))
+            return
+        evicted = None
         with self.lock:
             if key in self:
-                # Getting here means that this same key was added to the
-                # cache while the lock was released.  Since the link
-                # update is already done, we need only return the
-                # computed result and update the count of misses.
-                pass
+                # Refresh the value and move the link to the front of the queue.
+                node: DoublyLinkedListNode = super().__getitem__(key)
+                node.result = value
+                node.remove()
+                self.root.append_to_tail(node)
             elif self.full:
                 # Use the old root to store the new key and result.
                 oldroot: DoublyLinkedListNode = self.root
@@ -39,9 +107,10 @@ class LRUDict(dict):
                 # still adjusting the links.
                 self.root = oldroot.next
                 oldkey = self.root.key
+                evicted = (oldkey, self.root.result)
                 self.root.mark_to_root()
                 # Now update the cache dictionary.
-                del self[oldkey]
+                super().__delitem__(oldkey)
                 # Save the potentially reentrant cache[key] assignment
                 # for last, after the root and links have been put in
                 # a consistent state.
@@ -50,6 +119,38 @@ class LRUDict(dict):
                 node = DoublyLinkedListNode(key=key, result=value)
                 self.root.append_to_tail(node)
                 super().__setitem__(key, node)
+        if evicted is not None and self.on_evict is not None:
+            self.on_evict(*evicted)
+
+    def set_weighted(self, key, value, weight: int) -> None:
+        evicted: List[Tuple[Hashable, Any]] = []
+        with self.lock:
+            if key in self:
+                evicted.append((key, self._pop(key)))
+            if self.max_weight is not None and weight > self.max_weight:
+                # never fits, keep the other values
+                evicted.append((key, value))
+            else:
+                node = DoublyLinkedListNode(key=key, result=value)
+                self.root.append_to_tail(node)
+                super().__setitem__(key, node)
+                self.weights[key] = weight
+                self.weight += weight
+                while len(self) > self.max_size or (
+                    self.max_weight is not None and self.weight > self.max_weight
+                ):
+                    oldest = self.root.next.key
+                    evicted.append((oldest, self._pop(oldest)))
+        if self.on_evict is not None:
+            for item in evicted:
+                if item[0] != key or item[1] is value:
+                    self.on_evict(*item)
+
+    def _pop(self, key):
+        node: DoublyLinkedListNode = super().pop(key)
+        node.remove()
+        self.weight -= self.weights.pop(key, 0)
+        return node.result
 
     def __getitem__(self, item):
         # Move the link to the front of the circular queue
@@ -59,6 +160,33 @@ class LRUDict(dict):
             self.root.append_to_tail(node)
             return node.result
 
+    def __delitem__(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def pop(self, key, *default):
+        with self.lock:
+            try:
+                return self._pop(key)
+            except KeyError:
+                if default:
+                    return default[0]
+                raise
+
+    def peek(self, key, default=None):
+        """Read the value without moving the key to the front of the queue"""
+        node = dict.get(self, key)
+        return default if node is None else node.result
+
+    def remove(self, key, value) -> bool:
+        """Remove the key only if it still holds the value, return whether it did"""
+        with self.lock:
+            node = dict.get(self, key)
+            if node is None or node.result is not value:
+                return False
+            self._pop(key)
+            return True
+
     def get(self, k, default=None):
         """Use EAFP to avoid RLock"""
         try:
@@ -69,4 +197,6 @@ class LRUDict(dict):
     def clear(self):
         with self.lock:
             self.root = DoublyLinkedListNode()
+            self.weights.clear()
+            self.weight = 0
             super().clear()
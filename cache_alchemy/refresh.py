@@ -0,0 +1,59 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Hashable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Refresher:
+    """Recompute stale values in a bounded thread pool.
+
+    A key is refreshed by at most one task at a time, the refreshes requested
+    while it is pending are dropped, and so are the ones beyond ``max_pending``,
+    the callers keep being served the stale value meanwhile.
+    """
+
+    __slots__ = ("lock", "keys", "executor", "max_pending")
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 1000):
+        self.lock = Lock()
+        #: keys being refreshed right now
+        self.keys: Set[Hashable] = set()
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="cache-alchemy-refresh"
+        )
+        self.max_pending = max_pending
+
+    def __len__(self):
+        return len(self.keys)
+
+    def submit(self, key: Hashable, func: Callable, *args) -> bool:
+        """Return False if the key is already pending or the pool is full"""
+        with self.lock:
+            if key in self.keys or len(self.keys) >= self.max_pending:
+                return False
+            self.keys.add(key)
+        try:
+            self.executor.submit(self.run, key, func, *args)
+        except RuntimeError:
+            # shut down with the interpreter
+            self.done(key)
+            return False
+        return True
+
+    def run(self, key: Hashable, func: Callable, *args) -> None:
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("Failed to refresh %r", key)
+        finally:
+            self.done(key)
+
+    def done(self, key: Hashable) -> None:
+        with self.lock:
+            self.keys.discard(key)
+
+
+#: shared by the caches with ``stale_ttl``
+refresher = Refresher()
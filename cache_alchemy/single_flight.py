@@ -0,0 +1,43 @@
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one computation.
+
+    The first caller of a key computes the result, every caller arriving while
+    it is still in flight waits for it and shares its result or exception.
+    The key is forgotten once the computation finishes, so the registry only
+    ever holds the keys being computed right now.
+    """
+
+    __slots__ = ("lock", "calls")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls: Dict[Hashable, Future] = {}
+
+    def __len__(self):
+        return len(self.calls)
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        with self.lock:
+            in_flight = self.calls.get(key)
+            if in_flight is None:
+                future: Future = Future()
+                self.calls[key] = future
+        if in_flight is not None:
+            return in_flight.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
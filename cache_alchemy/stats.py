@@ -0,0 +1,199 @@
+import inspect
+import math
+import time
+from functools import update_wrapper, wraps
+from threading import Lock
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+#: operations timed by ``latency_stats``
+#: - lookup: a call of the cached function, hit or miss
+#: - compute: the cached function itself
+#: - serialize: dumping and loading the values stored in Redis
+#: - io: the Redis calls reading and storing the values, except the pipelined ones
+LATENCY_NAMES = ("lookup", "compute", "serialize", "io")
+
+
+class Latency(NamedTuple):
+    samples: int
+    #: seconds
+    total: float
+    #: upper bounds of the buckets the percentiles fall in, seconds
+    p50: float
+    p99: float
+    #: (upper bound in seconds, count) of the buckets counting any latency
+    buckets: Tuple[Tuple[float, int], ...]
+
+
+class Histogram:
+    """Count latencies in buckets doubling from one microsecond, the last one holds the rest"""
+
+    __slots__ = ("lock", "counts", "total")
+
+    size = 32
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counts: List[int] = [0] * self.size
+        self.total = 0.0
+
+    @classmethod
+    def upper_bound(cls, index: int) -> float:
+        if index == cls.size - 1:
+            return math.inf
+        return (1 << index) / 1_000_000
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counts = [0] * self.size
+            self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        index = min(int(seconds * 1_000_000).bit_length(), self.size - 1)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += seconds
+
+    def percentile(self, counts: List[int], fraction: float) -> float:
+        rank = fraction * sum(counts)
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                return self.upper_bound(index)
+        return 0.0
+
+    def snapshot(self) -> Latency:
+        with self.lock:
+            counts, total = list(self.counts), self.total
+        return Latency(
+            samples=sum(counts),
+            total=total,
+            p50=self.percentile(counts, 0.5),
+            p99=self.percentile(counts, 0.99),
+            buckets=tuple(
+                (self.upper_bound(index), count)
+                for index, count in enumerate(counts)
+                if count
+            ),
+        )
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    #: number of cached items
+    size: int
+    limit: int
+    #: estimated bytes of the cached values, 0 without ``max_bytes``
+    weight: int
+    #: empty without ``latency_stats``
+    latencies: Dict[str, Latency]
+
+
+class TimedFunction:
+    """Call the cached function through the timed wrapper, keep every other attribute
+    of the function, which the key builders and namespaces read.
+    """
+
+    def __init__(self, func: Callable, timed: Callable):
+        update_wrapper(self, func)
+        self.timed = timed
+
+    def __call__(self, *args, **kwargs):
+        return self.timed(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.__wrapped__, name)
+
+
+class CacheStats:
+    """Counters of a cache, exact under threads.
+
+    A lookup is counted when it starts, so a lookup is a hit unless it is counted as a miss.
+    """
+
+    __slots__ = ("lock", "lookups", "misses", "evictions", "histograms")
+
+    def __init__(self, latency: bool = False):
+        self.lock = Lock()
+        self.lookups = self.misses = self.evictions = 0
+        self.histograms: Dict[str, Histogram] = (
+            {name: Histogram() for name in LATENCY_NAMES} if latency else {}
+        )
+
+    @property
+    def hits(self) -> int:
+        return self.lookups - self.misses
+
+    def lookup(self, lookups: int = 1, misses: int = 0) -> None:
+        with self.lock:
+            self.lookups += lookups
+            self.misses += misses
+
+    def miss(self) -> None:
+        with self.lock:
+            self.misses += 1
+
+    def evict(self, count: int = 1) -> None:
+        with self.lock:
+            self.evictions += count
+
+    def reset(self) -> None:
+        with self.lock:
+            self.lookups = self.misses = self.evictions = 0
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def info(self, size: int, limit: int, weight: int) -> CacheInfo:
+        with self.lock:
+            lookups, misses, evictions = self.lookups, self.misses, self.evictions
+        return CacheInfo(
+            hits=lookups - misses,
+            misses=misses,
+            evictions=evictions,
+            size=size,
+            limit=limit,
+            weight=weight,
+            latencies={
+                name: histogram.snapshot()
+                for name, histogram in self.histograms.items()
+            },
+        )
+
+    def timed(
+        self, name: str, func: Callable, coroutine: Optional[bool] = None
+    ) -> Callable:
+        """Wrap the function to record its latency, or the latency of its coroutine.
+
+        :param coroutine: whether the function returns a coroutine, guessed if None.
+        """
+        record = self.histograms[name].record
+        perf_counter = time.perf_counter
+        if coroutine is None:
+            coroutine = inspect.iscoroutinefunction(func)
+
+        if coroutine:
+
+            @wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record(perf_counter() - start)
+
+            return timed_coroutine
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(perf_counter() - start)
+
+        return timed
+
+    def timed_function(self, name: str, func: Callable) -> TimedFunction:
+        return TimedFunction(func, self.timed(name, func))
@@ -1,5 +1,6 @@
+from hashlib import blake2b
 from types import FunctionType
-from typing import Dict, Tuple
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
 
 # SPECIAL_CHARS
 # closing ')', '}' and ']'
@@ -20,6 +21,16 @@ def escape(pattern):
         return pattern.translate(_special_chars_map).encode("latin1")
 
 
+_glob_special_chars_map = {i: "\\" + chr(i) for i in b"*?[]\\"}
+
+
+def escape_glob(pattern: str) -> str:
+    """
+    Escape special characters of a Redis glob-style pattern.
+    """
+    return pattern.translate(_glob_special_chars_map)
+
+
 class UnsupportedError(ValueError):
     pass
 
@@ -28,6 +39,153 @@ def generate_strict_key(
     *, args: Tuple, kwargs: Dict, func: FunctionType, is_method: bool = False
 ) -> Tuple[dict, dict, str]:
     """Generate function's arguments hash key from optionally typed positional and keyword arguments"""
+    keyword_args, kwargs, parts = generate_strict_key_parts(
+        args=args, kwargs=kwargs, func=func, is_method=is_method
+    )
+    return keyword_args, kwargs, "".join(name + value for name, value in parts)
+
+
+KeyBuilder = Callable[[Tuple, Dict], Tuple[dict, dict, str]]
+
+
+def make_strict_key_builder(
+    func: FunctionType, is_method: bool = False, prefix: str = ""
+) -> KeyBuilder:
+    """Generate a function building the same key as :func:`generate_strict_key` plus the prefix.
+
+    The signature is resolved once here, like ``dataclasses`` generates ``__init__``,
+    so a call only pays for reading its arguments and formatting them.
+    """
+    func_code = getattr(func, "__wrapped__", func).__code__
+    pos_count = func_code.co_argcount
+    arg_names = func_code.co_varnames
+    keyword_only_count = func_code.co_kwonlyargcount
+    keyword_only = arg_names[pos_count : (pos_count + keyword_only_count)]
+    defaults = func.__defaults__ or tuple()
+    kwdefaults = func.__kwdefaults__ or {}
+    non_default_count = pos_count - len(defaults)
+
+    start = 1 if is_method else 0
+    lines = ["n = len(args)", "keyword_args = {}"]
+    key = "{prefix}"
+    for index in range(start, pos_count):
+        name = arg_names[index]
+        if index < non_default_count:
+            keyword_value = f"kwargs.pop({name!r})"
+        else:
+            keyword_value = (
+                f"kwargs.pop({name!r}, defaults[{index - non_default_count}])"
+            )
+        lines += [
+            f"if n > {index}:",
+            f"    _{index} = args[{index}]",
+            "else:",
+            f"    _{index} = keyword_args[{name!r}] = {keyword_value}",
+        ]
+        key += f"{name}{{_{index}!r}}"
+
+    # *args, the extra positional arguments are skipped as many times as the parameters
+    if func_code.co_flags & 4:
+        name = arg_names[pos_count + keyword_only_count]
+        lines.append(
+            f"var_args = ''.join([f'{name}{{i}}{{v!r}}' for i, v in "
+            f"enumerate(args[{2 * pos_count + keyword_only_count}:])])"
+        )
+        key += "{var_args}"
+
+    # Keyword-only parameters.
+    for index, name in enumerate(keyword_only):
+        lines.append(
+            f"k{index} = keyword_args[{name!r}] = kwargs.pop({name!r}, kwdefaults.get({name!r}))"
+        )
+        key += f"{name}{{k{index}!r}}"
+
+    # **kwargs
+    if func_code.co_flags & 8:
+        lines.append(
+            "var_kwargs = ''.join([f'{k}{v!r}' for k, v in sorted(kwargs.items())])"
+        )
+        key += "{var_kwargs}"
+
+    lines.append(f'return keyword_args, kwargs, f"{key}"')
+    body = "\n".join(f"        {line}" for line in lines)
+    source = (
+        "def create_key_builder(prefix, defaults, kwdefaults):\n"
+        "    def build_key(args, kwargs):\n"
+        f"{body}\n"
+        "    return build_key\n"
+    )
+    namespace: Dict[str, Callable] = {}
+    exec(source, {}, namespace)
+    build_key = namespace["create_key_builder"](prefix, defaults, kwdefaults)
+    build_key.__qualname__ = f"{func.__qualname__}.build_key"
+    return build_key
+
+
+def make_fast_key_builder(
+    func: FunctionType, is_method: bool = False, prefix: str = ""
+) -> KeyBuilder:
+    """Same as :func:`generate_fast_key` plus the prefix"""
+    start = 1 if is_method else 0
+
+    def build_key(args: Tuple, kwargs: Dict) -> Tuple[dict, dict, str]:
+        key = args[start:]
+        if kwargs:
+            for item in kwargs.items():
+                key += item
+        return kwargs, {}, prefix + repr(key)
+
+    return build_key
+
+
+def make_digest_key_builder(
+    build_key: KeyBuilder, prefix: str, digest_size: int = 16
+) -> KeyBuilder:
+    """Replace the arguments part of the keys built with the prefix by its blake2b digest"""
+    prefix_length = len(prefix)
+
+    def build_digest_key(args: Tuple, kwargs: Dict) -> Tuple[dict, dict, str]:
+        keyword_args, kwargs, key = build_key(args, kwargs)
+        digest = blake2b(key[prefix_length:].encode(), digest_size=digest_size)
+        return keyword_args, kwargs, prefix + digest.hexdigest()
+
+    return build_digest_key
+
+
+#: separate the positional and keyword arguments of a tuple key
+_keyword_mark = (object(),)
+#: mark the key of unhashable arguments, falling back to their repr
+_unhashable_mark = object()
+
+
+def make_tuple_key_builder(
+    func: FunctionType, is_method: bool = False, prefix: str = ""
+) -> Callable[[Tuple, Dict], Tuple[dict, dict, Hashable]]:
+    """Build the arguments tuple itself as the key, like ``functools.lru_cache``.
+
+    The prefix is ignored, the key only identifies a call inside the function cache pool.
+    """
+    start = 1 if is_method else 0
+
+    def build_key(args: Tuple, kwargs: Dict) -> Tuple[dict, dict, Hashable]:
+        key = args[start:]
+        if kwargs:
+            key += _keyword_mark
+            for item in kwargs.items():
+                key += item
+        try:
+            hash(key)
+        except TypeError:
+            return kwargs, {}, (_unhashable_mark, repr(key))
+        return kwargs, {}, key
+
+    return build_key
+
+
+def generate_strict_key_parts(
+    *, args: Tuple, kwargs: Dict, func: FunctionType, is_method: bool = False
+) -> Tuple[dict, dict, List[Tuple[str, str]]]:
+    """Same as :func:`generate_strict_key`, but keep each ``(name, repr(value))`` apart"""
 
     #: The code object representing the compiled function body.
     func_code = getattr(func, "__wrapped__", func).__code__
@@ -55,7 +213,7 @@ def generate_strict_key(
     kwdefaults = func.__kwdefaults__
 
     keyword_args = {}
-    key = ""
+    parts = []
 
     start = 1 if is_method else 0
     args = args[start:]
@@ -63,20 +221,20 @@ def generate_strict_key(
     # Non-keyword-only parameters w/o defaults.
     non_default_count = pos_count - pos_default_count - start
     while args and non_default_count:
-        key += positional[0] + repr(args[0])
+        parts.append((positional[0], repr(args[0])))
         args = args[1:]
         non_default_count -= 1
         positional = positional[1:]
 
     while args and positional:
-        key += positional[0] + repr(args[0])
+        parts.append((positional[0], repr(args[0])))
         args = args[1:]
         defaults = defaults[1:]
         positional = positional[1:]
 
     while non_default_count:
         value = kwargs.pop(positional[0])
-        key += positional[0] + repr(value)
+        parts.append((positional[0], repr(value)))
         keyword_args[positional[0]] = value
         positional = positional[1:]
         non_default_count -= 1
@@ -84,7 +242,7 @@ def generate_strict_key(
     while defaults:
         value = kwargs.pop(positional[0], defaults[0])
         keyword_args[positional[0]] = value
-        key += positional[0] + repr(value)
+        parts.append((positional[0], repr(value)))
         defaults = defaults[1:]
         positional = positional[1:]
 
@@ -93,19 +251,19 @@ def generate_strict_key(
         arg_index = pos_count + keyword_only_count
         name = arg_names[arg_index]
         for sub_index, value in enumerate(args[arg_index:]):
-            key += f"{name}{sub_index}" + repr(value)
+            parts.append((f"{name}{sub_index}", repr(value)))
 
     # Keyword-only parameters.
     for name in keyword_only:
         value = kwargs.pop(name, kwdefaults.get(name))
         keyword_args[name] = value
-        key += name + repr(value)
+        parts.append((name, repr(value)))
 
     # **kwargs
     if func_code.co_flags & 8:
         for name, value in sorted(kwargs.items()):
-            key += name + repr(value)
-    return keyword_args, kwargs, key
+            parts.append((name, repr(value)))
+    return keyword_args, kwargs, parts
 
 
 def generate_strict_key_pattern(
@@ -115,14 +273,51 @@ def generate_strict_key_pattern(
     func: FunctionType,
     is_method: bool = False,
 ) -> str:
+    parts = generate_strict_key_pattern_parts(
+        args=args, kwargs=kwargs, func=func, is_method=is_method
+    )
+    return f"{_join_pattern_parts(parts, escape, r'.*?')}$"
+
+
+def generate_strict_key_glob(
+    *,
+    args: Tuple,
+    kwargs: Dict,
+    func: FunctionType,
+    is_method: bool = False,
+) -> str:
+    """Same as :func:`generate_strict_key_pattern`, but matched by Redis ``SCAN`` commands"""
+    parts = generate_strict_key_pattern_parts(
+        args=args, kwargs=kwargs, func=func, is_method=is_method
+    )
+    return _join_pattern_parts(parts, escape_glob, "*")
+
+
+def _join_pattern_parts(
+    parts: List[Tuple[str, Optional[str]]],
+    escape: Callable[[str], str],
+    fillvalue: str,
+) -> str:
+    return "".join(
+        name + (fillvalue if value is None else escape(value)) for name, value in parts
+    )
+
+
+def generate_strict_key_pattern_parts(
+    *,
+    args: Tuple,
+    kwargs: Dict,
+    func: FunctionType,
+    is_method: bool = False,
+) -> List[Tuple[str, Optional[str]]]:
+    """Generate ``(name, repr(value))`` parts of the keys to match, unknown value is None"""
     func_code = getattr(func, "__wrapped__", func).__code__
     pos_count = func_code.co_argcount
     arg_names = func_code.co_varnames
     positional = tuple(arg_names[:pos_count])
     keyword_only_count = func_code.co_kwonlyargcount
     keyword_only = arg_names[pos_count : (pos_count + keyword_only_count)]
-    fillvalue = r".*?"
-    key = ""
+    parts: List[Tuple[str, Optional[str]]] = []
 
     start = 1 if is_method else 0
     args = args[start:]
@@ -131,12 +326,12 @@ def generate_strict_key_pattern(
     while positional:
         name = positional[0]
         if args:
-            key += name + escape(repr(args[0]))
+            parts.append((name, repr(args[0])))
             args = args[1:]
         elif positional[0] in kwargs:
-            key += name + escape(repr(kwargs.pop(name)))
+            parts.append((name, repr(kwargs.pop(name))))
         else:
-            key += name + fillvalue
+            parts.append((name, None))
         positional = positional[1:]
 
     # *args
@@ -144,22 +339,22 @@ def generate_strict_key_pattern(
         arg_index = pos_count + keyword_only_count
         name = arg_names[arg_index]
         for sub_index, value in enumerate(args[arg_index:]):
-            key += f"{name}{sub_index}" + escape(repr(value))
-        key += fillvalue
+            parts.append((f"{name}{sub_index}", repr(value)))
+        parts.append(("", None))
 
     # Keyword-only parameters.
     for name in keyword_only:
         if name in kwargs:
-            key += name + escape(repr(kwargs.pop(name)))
+            parts.append((name, repr(kwargs.pop(name))))
         else:
-            key += name + fillvalue
+            parts.append((name, None))
 
     # **kwargs
     if func_code.co_flags & 8:
         for name, value in sorted(kwargs.items()):
-            key += name + escape(repr(value))
-        key += fillvalue
-    return f"{key}$"
+            parts.append((name, repr(value)))
+        parts.append(("", None))
+    return parts
 
 
 def generate_fast_key(
@@ -182,3 +377,13 @@ def generate_fast_key_pattern(
     is_method: bool = False,
 ) -> str:
     raise UnsupportedError("fast hash not support pattern delete")
+
+
+def generate_fast_key_glob(
+    *,
+    args: Tuple,
+    kwargs: Dict,
+    func: FunctionType,
+    is_method: bool = False,
+) -> str:
+    raise UnsupportedError("fast hash not support pattern delete")
@@ -1,4 +1,6 @@
+import asyncio
 import unittest
+from functools import wraps
 
 from fakeredis import FakeStrictRedis
 
@@ -19,3 +21,39 @@ class CacheTestCase(unittest.TestCase):
     def setUp(self) -> None:
         self.config = get_config()
         self.config.cache_redis_client.flushdb()
+
+
+def run_in_new_loop(test):
+    @wraps(test)
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.asyncSetUp())
+            loop.run_until_complete(test(self))
+        finally:
+            # Task.all_tasks before Python 3.7
+            all_tasks = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+            tasks = all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    return run
+
+
+class AsyncTestCase(unittest.TestCase):
+    """Run each coroutine test in a new event loop, like ``IsolatedAsyncioTestCase``
+    of Python 3.8, after awaiting ``asyncSetUp``.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if name.startswith("test") and asyncio.iscoroutinefunction(value):
+                setattr(cls, name, run_in_new_loop(value))
+
+    async def asyncSetUp(self) -> None:
+        pass
@@ -1,25 +1,389 @@
-from timeit import timeit
+"""Measure the throughput and the latencies of the hot paths.
 
-from cache_alchemy.utils import generate_fast_key, generate_strict_key
+Run every benchmark, or the ones whose name starts with one of the arguments::
 
-__all__ = ["generate_fast_key", "generate_strict_key"]
-tmp = lambda a, b=1, *, c, d=2, **kwd: ...
+    python -m tests.benchmark
+    python -m tests.benchmark key lru backend.json
 
+Save the results as a baseline, then compare another release or branch to it::
 
-def benchmark():
-    print(
-        timeit(
-            "fast_generate_key(args=(1,2), kwargs=dict(c=1,d=2), func=tmp)",
-            globals=globals(),
+    python -m tests.benchmark --save tests/benchmark_baseline.json
+    python -m tests.benchmark --compare tests/benchmark_baseline.json
+
+Redis is replaced by fakeredis, so the backends are measured without the network
+round trips, which only add a constant to each Redis call. Partial clears run
+at 10^3 and 10^4 keys, pass ``--max-keys 1000000`` to go up to 10^6 keys.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import sys
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from fakeredis import FakeAsyncRedis
+
+from cache_alchemy import __version__, cache
+from cache_alchemy.lru import LRUDict
+from cache_alchemy.utils import (
+    make_digest_key_builder,
+    make_fast_key_builder,
+    make_strict_key_builder,
+    make_tuple_key_builder,
+)
+from tests import get_config
+
+BACKENDS = {
+    "memory": "cache_alchemy.backends.memory.MemoryCache",
+    "distributed_memory": "cache_alchemy.backends.memory.DistributedMemoryCache",
+    "json": "cache_alchemy.backends.json.DistributedJsonCache",
+    "pickle": "cache_alchemy.backends.pickle.DistributedPickleCache",
+}
+ASYNC_BACKENDS = {
+    "async_json": "cache_alchemy.backends.json.AsyncDistributedJsonCache",
+    "async_pickle": "cache_alchemy.backends.pickle.AsyncDistributedPickleCache",
+}
+
+
+class Result(NamedTuple):
+    name: str
+    ops: int
+    ops_per_sec: float
+    #: seconds
+    p50: float
+    p99: float
+
+
+class Options(NamedTuple):
+    #: operations timed by each benchmark
+    number: int
+    threads: int
+    #: largest number of keys partially cleared
+    max_keys: int
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+
+def make_result(name: str, samples: List[float], elapsed: float) -> Result:
+    samples.sort()
+    return Result(
+        name=name,
+        ops=len(samples),
+        ops_per_sec=len(samples) / elapsed,
+        p50=percentile(samples, 0.5),
+        p99=percentile(samples, 0.99),
+    )
+
+
+def measure(
+    name: str, op: Callable[[], object], number: int, warmup: int = 100
+) -> Result:
+    """Time ``number`` calls of the operation after ``warmup`` untimed ones"""
+    for _ in range(warmup):
+        op()
+    perf_counter = time.perf_counter
+    samples = [0.0] * number
+    start = perf_counter()
+    for index in range(number):
+        op_start = perf_counter()
+        op()
+        samples[index] = perf_counter() - op_start
+    return make_result(name, samples, perf_counter() - start)
+
+
+def measure_async(
+    name: str,
+    op: Callable[[], Awaitable[object]],
+    number: int,
+    loop: asyncio.AbstractEventLoop,
+) -> Result:
+    async def run() -> Result:
+        for _ in range(100):
+            await op()
+        perf_counter = time.perf_counter
+        samples = [0.0] * number
+        start = perf_counter()
+        for index in range(number):
+            op_start = perf_counter()
+            await op()
+            samples[index] = perf_counter() - op_start
+        return make_result(name, samples, perf_counter() - start)
+
+    return loop.run_until_complete(run())
+
+
+def measure_threads(
+    name: str, op: Callable[[], object], number: int, threads: int
+) -> Result:
+    """Run ``number`` operations split between the threads, all started at once"""
+    barrier = threading.Barrier(threads + 1)
+    samples: List[List[float]] = [[] for _ in range(threads)]
+
+    def run(thread_samples: List[float]) -> None:
+        perf_counter = time.perf_counter
+        barrier.wait()
+        for _ in range(number // threads):
+            op_start = perf_counter()
+            op()
+            thread_samples.append(perf_counter() - op_start)
+
+    workers = [threading.Thread(target=run, args=(item,)) for item in samples]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return make_result(name, [sample for item in samples for sample in item], elapsed)
+
+
+benchmarks: Dict[str, Callable[[Options], Iterable[Result]]] = {}
+
+
+def benchmark(func: Callable[[Options], Iterable[Result]]):
+    benchmarks[func.__name__] = func
+    return func
+
+
+def make_cache(backend: str, **kwargs) -> Callable:
+    def add(a: int, b: int = 2) -> int:
+        return a + b
+
+    return cache(
+        limit=kwargs.pop("limit", -1),
+        expire=3600,
+        is_method=False,
+        strict=kwargs.pop("strict", False),
+        backend=backend,
+        dependency=[],
+        **kwargs,
+    )(add)
+
+
+@benchmark
+def key(options: Options) -> Iterable[Result]:
+    def func(a, b=1, *, c, d=2, **kwargs): ...
+
+    builders = {
+        "fast": make_fast_key_builder(func, prefix="prefix:"),
+        "strict": make_strict_key_builder(func, prefix="prefix:"),
+        "digest": make_digest_key_builder(
+            make_strict_key_builder(func, prefix="prefix:"), "prefix:"
+        ),
+        "tuple": make_tuple_key_builder(func),
+    }
+    for name, build_key in builders.items():
+        yield measure(
+            f"key.{name}",
+            lambda: build_key((1, 2), {"c": 1, "d": 2, "e": 3}),
+            options.number,
+        )
+
+
+@benchmark
+def lru(options: Options) -> Iterable[Result]:
+    lru_dict = LRUDict(1000)
+    for index in range(1000):
+        lru_dict[index] = index
+    keys = itertools.cycle(range(1000))
+    yield measure("lru.get", lambda: lru_dict.get(next(keys)), options.number)
+    yield measure(
+        "lru.set", lambda: lru_dict.__setitem__(next(keys), 0), options.number
+    )
+    new_keys = itertools.count(1000)
+    yield measure(
+        "lru.set_evict",
+        lambda: lru_dict.__setitem__(next(new_keys), 0),
+        options.number,
+    )
+
+
+@benchmark
+def backend(options: Options) -> Iterable[Result]:
+    for name, backend_path in BACKENDS.items():
+        add = make_cache(backend_path)
+        add(1)
+        yield measure(f"backend.{name}.hit", lambda: add(1), options.number)
+        arguments = itertools.count(2)
+        yield measure(
+            f"backend.{name}.miss", lambda: add(next(arguments)), options.number
+        )
+        add.cache_clear()
+
+    loop = asyncio.new_event_loop()
+    for name, backend_path in ASYNC_BACKENDS.items():
+        async_add = make_cache(backend_path)
+        loop.run_until_complete(async_add(1))
+        yield measure_async(
+            f"backend.{name}.hit", lambda: async_add(1), options.number, loop
+        )
+        arguments = itertools.count(2)
+        yield measure_async(
+            f"backend.{name}.miss",
+            lambda: async_add(next(arguments)),
+            options.number,
+            loop,
+        )
+        loop.run_until_complete(async_add.cache_clear())
+    loop.close()
+
+
+@benchmark
+def clear(options: Options) -> Iterable[Result]:
+    """Clear one tenth of the keys by a keyword argument, three tenths in a row"""
+    strategies = {
+        # match every key against the pattern
+        "memory.pattern": (BACKENDS["memory"], False),
+        "memory.index": (BACKENDS["memory"], True),
+        # scan the namespace inside Redis
+        "json.scan": (BACKENDS["json"], False),
+        "json.index": (BACKENDS["json"], True),
+    }
+    size = 1000
+    while size <= options.max_keys:
+        for name, (backend_path, argument_index) in strategies.items():
+            add = make_cache(backend_path, strict=True, argument_index=argument_index)
+            for start in range(0, size, 1000):
+                add.cache_get_many(
+                    [((a, a % 10), {}) for a in range(start, min(start + 1000, size))]
+                )
+            values = iter(range(3))
+            yield measure(
+                f"clear.{name}.{size}",
+                lambda: add.cache_clear(b=next(values)),
+                3,
+                warmup=0,
+            )
+            add.cache_clear()
+        size *= 10
+
+
+@benchmark
+def threads(options: Options) -> Iterable[Result]:
+    lru_dict = LRUDict(1000)
+    for index in range(1000):
+        lru_dict[index] = index
+    keys = itertools.cycle(range(1000))
+    yield measure_threads(
+        "threads.lru.get",
+        lambda: lru_dict.get(next(keys)),
+        options.number,
+        options.threads,
+    )
+    for name in ("memory", "json"):
+        add = make_cache(BACKENDS[name], limit=100)
+        arguments = itertools.cycle(range(200))
+        yield measure_threads(
+            f"threads.{name}.mixed",
+            lambda: add(next(arguments)),
+            options.number,
+            options.threads,
         )
+        add.cache_clear()
+
+
+def run(options: Options, names: Iterable[str] = ()) -> Dict[str, Result]:
+    config = get_config()
+    config.cache_redis_client.flushdb()
+    config.cache_async_redis_client = FakeAsyncRedis.from_url(
+        config.CACHE_ALCHEMY_REDIS_URL
+    )
+    results = {}
+    for name, func in benchmarks.items():
+        if names and not any(name.startswith(prefix.split(".")[0]) for prefix in names):
+            continue
+        for result in func(options):
+            if not names or any(result.name.startswith(prefix) for prefix in names):
+                results[result.name] = result
+                print(format_result(result), flush=True)
+    return results
+
+
+def format_result(result: Result, baseline: Optional[dict] = None) -> str:
+    line = (
+        f"{result.name:<36}{result.ops_per_sec:>14,.0f} ops/s"
+        f"{result.p50 * 1e6:>12,.1f} us p50{result.p99 * 1e6:>12,.1f} us p99"
     )
-    print(
-        timeit(
-            "strict_generate_key(args=(), kwargs=dict(a=1,b=2, c=1,d=2,e=3), func=tmp)",
-            globals=globals(),
+    if baseline is not None:
+        line += f"{result.ops_per_sec / baseline['ops_per_sec']:>10.2f}x"
+    return line
+
+
+def save(path: str, results: Dict[str, Result]) -> None:
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "version": __version__,
+                "python": platform.python_version(),
+                "results": {
+                    name: {
+                        "ops_per_sec": result.ops_per_sec,
+                        "p50": result.p50,
+                        "p99": result.p99,
+                    }
+                    for name, result in results.items()
+                },
+            },
+            file,
+            indent=2,
+            sort_keys=True,
         )
+        file.write("\n")
+
+
+def compare(path: str, results: Dict[str, Result], tolerance: float) -> List[str]:
+    """Print the throughput relative to the baseline, return the regressions"""
+    with open(path) as file:
+        baseline = json.load(file)
+    print(f"\ncompared to {baseline['version']} on Python {baseline['python']}")
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            continue
+        print(format_result(result, baseline["results"][name]))
+        if (
+            result.ops_per_sec
+            < (1 - tolerance) * baseline["results"][name]["ops_per_sec"]
+        ):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("names", nargs="*", help="prefixes of the benchmarks to run")
+    parser.add_argument("--number", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--max-keys", type=int, default=10_000)
+    parser.add_argument("--save", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", help="compare the results to a JSON baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fail if a throughput is lower than the baseline by more than this fraction",
+    )
+    arguments = parser.parse_args(argv)
+    results = run(
+        Options(arguments.number, arguments.threads, arguments.max_keys),
+        arguments.names,
     )
+    if arguments.save:
+        save(arguments.save, results)
+    if arguments.compare:
+        regressions = compare(arguments.compare, results, arguments.tolerance)
+        if regressions:
+            print(f"\nslower than the baseline: {', '.join(regressions)}")
+            return 1
+    return 0
 
 
 if __name__ == "__main__":
-    benchmark()
+    sys.exit(main())
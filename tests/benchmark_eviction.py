@@ -0,0 +1,73 @@
+"""Compare the hit ratios of the eviction policies.
+
+Replay recorded traces, one key per line, given as arguments::
+
+    python -m tests.benchmark_eviction trace.txt
+
+or synthetic traces without any argument.
+"""
+
+import random
+import sys
+from typing import Dict, Iterable, List
+
+from cache_alchemy.eviction import eviction_dicts
+
+
+def zipf_trace(length: int, keys: int, seed: int = 0) -> List[int]:
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    return rng.choices(range(keys), weights, k=length)
+
+
+def scan_trace(length: int, keys: int, seed: int = 0) -> List[int]:
+    """A zipf working set interrupted by scans reading every key once"""
+    trace: List[int] = []
+    scan_start = keys
+    for chunk in range(length // (2 * keys)):
+        trace.extend(zipf_trace(keys, keys, seed + chunk))
+        trace.extend(range(scan_start, scan_start + keys))
+        scan_start += keys
+    return trace
+
+
+def load_trace(path: str) -> List[str]:
+    with open(path) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def hit_ratio(eviction: str, trace: Iterable, size: int) -> float:
+    cache = eviction_dicts[eviction](size)
+    hits = requests = 0
+    for key in trace:
+        requests += 1
+        if cache.get(key) is None:
+            cache[key] = True
+        else:
+            hits += 1
+    return hits / requests
+
+
+def benchmark(traces: Dict[str, list], sizes: Iterable[int] = (100, 1000)):
+    print(
+        f"{'trace':<20}{'size':>8}" + "".join(f"{name:>10}" for name in eviction_dicts)
+    )
+    for trace_name, trace in traces.items():
+        for size in sizes:
+            ratios = [hit_ratio(name, trace, size) for name in eviction_dicts]
+            print(
+                f"{trace_name:<20}{size:>8}"
+                + "".join(f"{ratio:>10.2%}" for ratio in ratios)
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:]:
+        benchmark({path: load_trace(path) for path in sys.argv[1:]})
+    else:
+        benchmark(
+            {
+                "zipf": zipf_trace(200_000, 10_000),
+                "zipf with scans": scan_trace(200_000, 10_000),
+            }
+        )
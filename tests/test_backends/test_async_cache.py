@@ -0,0 +1,327 @@
+import asyncio
+import unittest
+from unittest.mock import Mock, patch
+
+from fakeredis import FakeAsyncRedis
+
+from cache_alchemy import (
+    async_json_cache,
+    async_pickle_cache,
+    method_async_json_cache,
+    json_cache,
+)
+from cache_alchemy.backends.json import AsyncDistributedJsonCache
+from cache_alchemy.dependency import FunctionCacheDependency
+from cache_alchemy.invalidation import INVALIDATION_CHANNEL, encode_invalidation
+from cache_alchemy.utils import UnsupportedError
+from tests import AsyncTestCase, get_config
+from tests.test_backends.test_pickle_cache import TestObject
+
+
+class AsyncCacheTestCase(AsyncTestCase):
+    async def asyncSetUp(self) -> None:
+        self.config = get_config()
+        self.config.cache_async_redis_client = FakeAsyncRedis.from_url(
+            self.config.CACHE_ALCHEMY_REDIS_URL
+        )
+        await self.config.cache_async_redis_client.flushdb()
+
+    async def test_cache_function(self):
+        call_mock = Mock()
+
+        @async_json_cache()
+        async def add(a: int, b: int = 2) -> int:
+            call_mock()
+            await asyncio.sleep(0)
+            return a + b
+
+        self.assertTrue(asyncio.iscoroutinefunction(add))
+        self.assertEqual(0, await add.cache_clear())
+        self.assertEqual(3, await add(1))
+        self.assertEqual(3, await add(1))
+        self.assertEqual(1, call_mock.call_count)
+        self.assertEqual(1, add.cache.misses)
+        self.assertEqual(1, add.cache.hits)
+        self.assertEqual(4, await add(2))
+        self.assertEqual(2, call_mock.call_count)
+        self.assertEqual(2, await add.cache_clear())
+        self.assertEqual(3, await add(1))
+        self.assertEqual(3, call_mock.call_count)
+
+        with self.assertRaises(UnsupportedError):
+            await add.cache_clear(a=1)
+
+    async def test_strict_cache_clear_with_pattern(self):
+        call_mock = Mock()
+
+        @async_json_cache(strict=True)
+        def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        await add(1)
+        await add(a=2)
+        self.assertEqual(2, call_mock.call_count)
+        self.assertEqual(1, await add.cache_clear(a=1))
+        await add(2)
+        self.assertEqual(2, call_mock.call_count)
+        await add(1)
+        self.assertEqual(3, call_mock.call_count)
+
+    async def test_cache_clear_with_argument_index(self):
+        call_mock = Mock()
+
+        @async_json_cache(strict=True, argument_index=True)
+        async def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        await add(1)
+        await add(1, b=3)
+        self.assertEqual([4, 5], await add.cache_get_many([((2,), {}), ((2, 3), {})]))
+        self.assertEqual(2, await add.cache_clear(a=1))
+        self.assertEqual(1, await add.cache_clear(b=3))
+        self.assertEqual(1, await add.cache_clear())
+        self.assertEqual(4, call_mock.call_count)
+
+    async def test_near_cache(self):
+        call_mock = Mock()
+        client = self.config.cache_async_redis_client
+
+        @async_json_cache(near_cache_limit=2)
+        async def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        self.assertEqual(3, await add(1))
+        with patch.object(client, "get", side_effect=AssertionError):
+            self.assertEqual(3, await add(1))
+        self.assertEqual(1, call_mock.call_count)
+
+        await asyncio.sleep(0.1)
+        await client.publish(
+            INVALIDATION_CHANNEL,
+            encode_invalidation("other", add.cache.namespace, None),
+        )
+        for _ in range(100):
+            if not add.cache.near_cache:
+                break
+            await asyncio.sleep(0.01)
+        self.assertFalse(add.cache.near_cache)
+        self.assertEqual(3, await add(1))
+        self.assertEqual(1, await add.cache_clear())
+        self.assertFalse(add.cache.near_cache)
+
+        # the failed listening task forgets every copy, the next read restarts it
+        self.assertEqual(3, await add(1))
+        task = add.cache.listener.task
+        with self.assertLogs("cache_alchemy.invalidation", "ERROR"):
+            await client.publish(INVALIDATION_CHANNEL, b"malformed")
+            for _ in range(100):
+                if task.done():
+                    break
+                await asyncio.sleep(0.01)
+        self.assertFalse(add.cache.near_cache)
+        self.assertEqual(3, await add(1))
+        self.assertIsNot(task, add.cache.listener.task)
+        self.assertFalse(add.cache.listener.task.done())
+
+    async def test_stale_ttl(self):
+        call_mock = Mock()
+
+        @async_json_cache(expire=1, stale_ttl=60)
+        async def count(a: int) -> int:
+            call_mock()
+            return call_mock.call_count
+
+        self.assertEqual(1, await count(1))
+        await asyncio.sleep(1.1)
+        # served stale while refreshed in a task
+        self.assertEqual(1, await count(1))
+        self.assertEqual(1, await count(1))
+        self.assertEqual(1, len(count.cache.refreshing))
+        for _ in range(100):
+            if not count.cache.refreshing:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(2, call_mock.call_count)
+        self.assertEqual(2, await count(1))
+
+        # a failed refresh is logged
+        key = count.cache.make_key((1,), {})[2]
+        with patch.object(count.cache, "compute", side_effect=ValueError):
+            with self.assertLogs("cache_alchemy.backends.base", "ERROR"):
+                count.cache.refresh(key, (1,), {})
+                self.assertEqual(1, len(count.cache.refresh_tasks))
+                for _ in range(100):
+                    if not count.cache.refresh_tasks:
+                        break
+                    await asyncio.sleep(0.01)
+        self.assertFalse(count.cache.refreshing)
+
+    async def test_early_refresh(self):
+        call_mock = Mock()
+
+        @async_json_cache(expire=60, early_refresh=1)
+        async def count(a: int) -> int:
+            call_mock()
+            return call_mock.call_count
+
+        self.assertEqual(1, await count(1))
+        await count.cache.set(count.cache.make_key((1,), {})[2], 1, delta=100)
+        with patch("random.random", return_value=0.1):
+            self.assertEqual(1, await count(1))
+        with patch("random.random", return_value=0.9):
+            self.assertEqual(2, await count(1))
+
+    async def test_negative_ttl(self):
+        call_mock = Mock()
+
+        @async_json_cache(negative_ttl=10, negative_exceptions=(KeyError,))
+        async def find(name: str) -> str:
+            call_mock()
+            raise KeyError(name)
+
+        for _ in range(2):
+            with self.assertRaises(KeyError):
+                await find("missing")
+        self.assertEqual(1, call_mock.call_count)
+        self.assertGreater(
+            11,
+            await self.config.cache_async_redis_client.ttl(
+                find.cache.make_key(("missing",), {})[2]
+            ),
+        )
+
+    async def test_cache_limit_and_flush(self):
+        @async_json_cache(limit=1)
+        async def add(a: int, b: int = 2) -> int:
+            return a + b
+
+        await add(1)
+        await add(2)
+        self.assertEqual(
+            1,
+            await self.config.cache_async_redis_client.scard(add.cache.namespace),
+        )
+        self.assertEqual(
+            1,
+            len(
+                await AsyncDistributedJsonCache.get_all_namespace(
+                    self.config.CACHE_ALCHEMY_CACHE_KEY_PREFIX
+                )
+            ),
+        )
+        self.assertEqual(
+            1,
+            await AsyncDistributedJsonCache.flush_cache(
+                self.config.CACHE_ALCHEMY_CACHE_KEY_PREFIX
+            ),
+        )
+
+    async def test_cache_info(self):
+        @async_json_cache(limit=1, latency_stats=True)
+        async def add(a: int, b: int = 2) -> int:
+            await asyncio.sleep(0.01)
+            return a + b
+
+        for a in (1, 1, 2):
+            await add(a)
+        await add.cache_get_many([((3,), {})])
+        info = await add.cache_info()
+        self.assertEqual((1, 3, 2, 1, 1), info[:5])
+        self.assertEqual(3, info.latencies["lookup"].samples)
+        # the coroutines are timed, not their creation
+        self.assertGreaterEqual(info.latencies["compute"].total, 0.03)
+        # 3 fetches, 2 set scripts and one fetch_many
+        self.assertEqual(6, info.latencies["io"].samples)
+
+    async def test_cache_events(self):
+        received = []
+
+        @async_json_cache(limit=1, eviction="lru", listeners=[received.append])
+        async def add(a: int, b: int = 2) -> int:
+            await asyncio.sleep(0.01)
+            return a + b
+
+        await add(1)
+        await add(1)
+        await add(2)
+        await add.cache_clear()
+        self.assertEqual(
+            ["set", "miss", "hit", "evict", "set", "miss", "clear"],
+            [event.name for event in received],
+        )
+        self.assertGreaterEqual(received[1].duration, 0.01)
+
+    async def test_cache_get_many(self):
+        call_mock = Mock()
+
+        @async_json_cache()
+        async def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        self.assertEqual(3, await add(1))
+        calls = [((1,), {}), ((2,), {"b": 3}), ((2,), {"b": 3})]
+        self.assertEqual([3, 5, 5], await add.cache_get_many(calls))
+        self.assertEqual([3, 5, 5], await add.cache_get_many(calls))
+        self.assertEqual(2, call_mock.call_count)
+
+    async def test_single_flight(self):
+        call_mock = Mock()
+
+        @async_pickle_cache(single_flight=True)
+        async def hello(name: str) -> TestObject:
+            call_mock()
+            await asyncio.sleep(0.1)
+            return TestObject(name=name)
+
+        results = await asyncio.gather(*(hello("world") for _ in range(3)))
+        self.assertEqual([TestObject(name="world")] * 3, results)
+        self.assertEqual(1, call_mock.call_count)
+
+        # the previous lock holder filled the key right before the lock was acquired
+        _, _, cache_key = hello.cache.make_key(args=("alchemy",), kwargs={})
+        await hello.cache.set(cache_key, TestObject(name="cache"))
+        self.assertEqual(
+            TestObject(name="cache"),
+            await hello.cache.get_single_flight(cache_key, ("alchemy",), {}),
+        )
+        self.assertEqual(1, call_mock.call_count)
+
+    async def test_cache_method_and_dependency(self):
+        call_mock = Mock()
+
+        @async_json_cache
+        async def add(a: int, b: int) -> int:
+            return a + b
+
+        class Tmp:
+            @method_async_json_cache(dependency=[FunctionCacheDependency(add)])
+            async def add_and_double(self, a: int, b: int) -> int:
+                call_mock()
+                return await add(a, b) * 2
+
+        self.assertEqual(4, await Tmp().add_and_double(1, 1))
+        self.assertEqual(4, await Tmp().add_and_double(1, 1))
+        self.assertEqual(1, call_mock.call_count)
+        self.assertEqual(2, await add.cache_clear())
+        self.assertEqual(4, await Tmp().add_and_double(1, 1))
+        self.assertEqual(2, call_mock.call_count)
+
+        @json_cache
+        def mul(a: int, b: int) -> int:
+            return a * b
+
+        @async_json_cache(dependency=[FunctionCacheDependency(mul)])
+        async def mul_and_double(a: int, b: int) -> int:
+            return mul(a, b) * 2
+
+        self.assertEqual(4, await mul_and_double(1, 2))
+        with self.assertRaises(UnsupportedError):
+            mul.cache_clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,21 @@
+import pickle
+import threading
 import time
 import unittest
-from typing import Type
-from unittest.mock import Mock
+from typing import Optional, Type
+from unittest.mock import Mock, patch
 
 from configalchemy.utils import import_reference
 
 from cache_alchemy import json_cache, method_json_cache, property_json_cache
 from cache_alchemy.backends.json import DistributedJsonCache
+from cache_alchemy.envelope import ERROR_TAG, unwrap
+from cache_alchemy.invalidation import (
+    INVALIDATION_CHANNEL,
+    decode_invalidation,
+    encode_invalidation,
+)
+from cache_alchemy.refresh import Refresher
 from cache_alchemy.utils import UnsupportedError
 from tests import CacheTestCase
 
@@ -161,6 +170,314 @@ class JsonCacheTestCase(CacheTestCase):
         self.assertEqual(2, call_mock.call_count)
         self.assertEqual(1, hello.cache_clear(name="world", status="prod"))
 
+    def test_cache_clear_with_pattern_and_special_characters(self):
+        call_mock = Mock()
+
+        @json_cache(strict=True)
+        def hello(name: str, status: str = "") -> str:
+            call_mock()
+            return name
+
+        for name in ("w*rld", "w?rld", "[world]", "world\\", "world"):
+            hello(name=name, status="test")
+        self.assertEqual(5, call_mock.call_count)
+        self.assertEqual(1, hello.cache_clear(name="w*rld"))
+        self.assertEqual(1, hello.cache_clear(name="[world]"))
+        self.assertEqual(1, hello.cache_clear(name="world\\"))
+        self.assertEqual(0, hello.cache_clear(name="w*rld"))
+        self.assertEqual(2, hello.cache_clear(status="test"))
+
+    def test_cache_clear_with_argument_index(self):
+        call_mock = Mock()
+        client = self.config.cache_redis_client
+
+        @json_cache(limit=3, strict=True, argument_index=True, eviction="lru")
+        def hello(name: str, status: str = "") -> str:
+            call_mock()
+            return name
+
+        for name in ("w*rld", "[world]", "world"):
+            hello(name=name, status="test")
+        self.assertEqual(1, hello.cache_clear(name="w*rld"))
+        self.assertEqual(0, hello.cache_clear(name="w*rld"))
+        self.assertEqual(1, hello.cache_clear(name="world", status="test"))
+        self.assertEqual(["world"], hello.cache_get_many([(("world",), {})]))
+        hello("again")
+        # evict the least recently used "[world]"
+        hello("new", status="test")
+        # neither the cleared nor the evicted keys are left in the index
+        self.assertEqual(
+            {hello.cache.make_key(("new",), {"status": "test"})[2].encode()},
+            client.smembers(f"{hello.cache.namespace}-index:status='test'"),
+        )
+        self.assertEqual(1, hello.cache_clear(status="test"))
+        self.assertEqual(6, call_mock.call_count)
+        self.assertEqual(2, hello.cache_clear())
+        self.assertEqual(
+            [], client.keys(f"{hello.cache.namespace}-ind*".replace("[", "\\["))
+        )
+
+    def test_cache_digest_key(self):
+        call_mock = Mock()
+        client = self.config.cache_redis_client
+
+        @json_cache(strict=True, digest_key=True)
+        def count(words: list, status: str = "") -> int:
+            call_mock()
+            return len(words)
+
+        words = ["word"] * 1000
+        self.assertTrue(count.cache.argument_index)
+        self.assertEqual(1000, count(words, status="test"))
+        self.assertEqual(1000, count(words, status="test"))
+        self.assertEqual(1, count(["word"]))
+        self.assertEqual(2, call_mock.call_count)
+        for key in client.smembers(count.cache.namespace):
+            self.assertEqual(
+                len(count.cache.function_hash) + 1 + 2 * count.cache.digest_size,
+                len(key),
+            )
+        # the index sets are named by the digests of the arguments too
+        for index in client.smembers(count.cache.indexes_namespace):
+            self.assertGreater(len(count.cache.namespace) + 100, len(index))
+        self.assertEqual(1, count.cache_clear(status="test"))
+        self.assertEqual(1, count(["word"]))
+        self.assertEqual(2, call_mock.call_count)
+        with self.assertRaises(UnsupportedError):
+            count.cache.cache_clear(args=(), kwargs={"unknown": 1})
+        self.assertEqual(1, count.cache_clear())
+
+    def test_stale_ttl(self):
+        call_mock = Mock()
+        client = self.config.cache_redis_client
+
+        @json_cache(expire=1, stale_ttl=60)
+        def count(a: int) -> int:
+            call_mock()
+            return call_mock.call_count
+
+        count.cache.refresher = Refresher(max_workers=1)
+        self.assertEqual(1, count(1))
+        self.assertLess(1, client.ttl(count.cache.make_key((1,), {})[2]))
+        time.sleep(1.1)
+        # served stale while refreshed in the background
+        self.assertEqual(1, count(1))
+        count.cache.refresher.executor.shutdown(wait=True)
+        self.assertEqual(2, call_mock.call_count)
+        self.assertEqual(2, count(1))
+        self.assertEqual([2], count.cache.get_many([((1,), {})]))
+
+        # batches refresh the stale values too
+        count.cache.refresher = Refresher(max_workers=1)
+        time.sleep(1.1)
+        self.assertEqual([2], count.cache_get_many([((1,), {})]))
+        count.cache.refresher.executor.shutdown(wait=True)
+        self.assertEqual(3, call_mock.call_count)
+        self.assertEqual([3], count.cache_get_many([((1,), {})]))
+
+    def test_early_refresh(self):
+        call_mock = Mock()
+
+        with self.assertRaises(ValueError):
+            json_cache(early_refresh=-1)(lambda: ...)
+
+        @json_cache(expire=60, early_refresh=1)
+        def count(a: int) -> int:
+            call_mock()
+            return call_mock.call_count
+
+        self.assertEqual(1, count(1))
+        with patch("random.random", return_value=0.99):
+            # computed in no time, never refreshed early
+            self.assertEqual(1, count(1))
+            # computed in 100 seconds, expires in 60 seconds
+            count.cache.set(count.cache.make_key((1,), {})[2], 1, delta=100)
+        with patch("random.random", return_value=0.1):
+            self.assertEqual(1, count(1))
+        with patch("random.random", return_value=0.9):
+            self.assertEqual(2, count(1))
+        self.assertEqual(2, count(1))
+        self.assertEqual(2, count.cache.misses)
+
+        @json_cache(expire=60, early_refresh=1)
+        def slow(a: int) -> int:
+            time.sleep(0.05)
+            return a
+
+        # batches store the time each value took to compute
+        self.assertEqual([1, 2], slow.cache_get_many([((1,), {}), ((2,), {})]))
+        for a in (1, 2):
+            stored = self.config.cache_redis_client.get(
+                slow.cache.make_key((a,), {})[2]
+            )
+            self.assertLess(0.04, unwrap(stored)[0].delta)
+
+    def test_negative_ttl(self):
+        call_mock = Mock()
+        client = self.config.cache_redis_client
+
+        class UnpicklableError(Exception):
+            def __init__(self, a, b):
+                super().__init__(a)
+
+        @json_cache(
+            expire=100, negative_ttl=10, negative_exceptions=(LookupError, Exception)
+        )
+        def find(name: str) -> Optional[str]:
+            call_mock()
+            if name == "missing":
+                raise KeyError(name)
+            if name == "unpicklable":
+                raise UnpicklableError(name, name)
+            return name if name else None
+
+        for _ in range(2):
+            self.assertIsNone(find(""))
+            with self.assertRaises(KeyError) as context:
+                find("missing")
+            self.assertEqual(("missing",), context.exception.args)
+            with self.assertRaises(UnpicklableError):
+                find("unpicklable")
+        self.assertEqual(4, call_mock.call_count)
+        self.assertGreater(100, client.ttl(find.cache.make_key(("",), {})[2]))
+        self.assertGreater(100, client.ttl(find.cache.make_key(("missing",), {})[2]))
+        self.assertEqual("a", find("a"))
+        self.assertLess(10, client.ttl(find.cache.make_key(("a",), {})[2]))
+
+        @json_cache()
+        def echo(name: str) -> str:
+            call_mock()
+            return name
+
+        # only the caches with negative_exceptions unpickle a cached exception
+        client.set(
+            echo.cache.make_key(("a",), {})[2], ERROR_TAG + pickle.dumps(KeyError("a"))
+        )
+        with self.assertRaises(ValueError):
+            echo("a")
+        self.assertEqual(5, call_mock.call_count)
+
+        @json_cache(expire=100, negative_ttl=1, strict=True, argument_index=True)
+        def score(user_id: int, game: int) -> Optional[int]:
+            return game if game == 1 else None
+
+        # a short-lived negative result does not shorten the shared index sets
+        self.assertEqual(1, score(42, 1))
+        self.assertIsNone(score(42, 2))
+        time.sleep(1.2)
+        self.assertEqual(2, score.cache_clear(user_id=42))
+        self.assertFalse(client.exists(score.cache.make_key((42, 1), {})[2]))
+
+    def test_near_cache(self):
+        call_mock = Mock()
+        client = self.config.cache_redis_client
+
+        @json_cache(near_cache_limit=2)
+        def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        def wait_for(predicate):
+            deadline = time.monotonic() + 5
+            while not predicate() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(predicate())
+
+        self.assertEqual(3, add(1))
+        with patch.object(client, "get", side_effect=AssertionError):
+            self.assertEqual(3, add(1))
+        self.assertEqual(1, call_mock.call_count)
+
+        # another process updates the key
+        key = add.cache.make_key((1,), {})[2]
+        client.set(key, b"4")
+        client.publish(
+            INVALIDATION_CHANNEL, encode_invalidation("other", add.cache.namespace, key)
+        )
+        wait_for(lambda: key not in add.cache.near_cache)
+        self.assertEqual(4, add(1))
+
+        # another process clears the namespace
+        add(2)
+        client.publish(
+            INVALIDATION_CHANNEL,
+            encode_invalidation("other", add.cache.namespace, None),
+        )
+        wait_for(lambda: not add.cache.near_cache)
+
+        subscriber = client.pubsub(ignore_subscribe_messages=True)
+        subscriber.subscribe(INVALIDATION_CHANNEL)
+        self.assertEqual(2, add.cache_clear())
+        for _ in range(10):
+            message = subscriber.get_message(timeout=1)
+            if message is not None:
+                break
+        self.assertEqual(
+            (add.cache.listener.token, add.cache.namespace, None),
+            decode_invalidation(message["data"]),
+        )
+        self.assertEqual(3, add(1))
+        self.assertEqual(3, call_mock.call_count)
+
+        # a failing listener forgets every copy, and keeps listening
+        with self.assertLogs("cache_alchemy.invalidation", "ERROR"):
+            client.publish(INVALIDATION_CHANNEL, b"malformed")
+            wait_for(lambda: not add.cache.near_cache)
+        self.assertTrue(add.cache.listener.thread.is_alive())
+        add(1)
+        client.publish(
+            INVALIDATION_CHANNEL, encode_invalidation("other", add.cache.namespace, key)
+        )
+        wait_for(lambda: not add.cache.near_cache)
+
+        # a value invalidated while it is read is not kept
+        fetch = add.cache.fetch
+
+        def invalidated_fetch(cache_key):
+            result = fetch(cache_key)
+            add.cache.invalidate(cache_key)
+            return result
+
+        with patch.object(add.cache, "fetch", side_effect=invalidated_fetch):
+            self.assertEqual(3, add(1))
+        self.assertFalse(add.cache.near_cache)
+        self.assertEqual(3, add(1))
+        self.assertTrue(add.cache.near_cache)
+
+        # a forked process listens in its own thread, under its own token
+        listener = add.cache.listener
+        pid, token, thread = listener.pid, listener.token, listener.thread
+        with patch("os.getpid", return_value=pid + 1):
+            self.assertEqual(3, add(1))
+            self.assertNotEqual(token, listener.token)
+            self.assertIsNot(thread, listener.thread)
+            self.assertTrue(listener.thread.is_alive())
+            self.assertTrue(add.cache.near_cache)
+            # the parent process clears the namespace
+            client.publish(
+                INVALIDATION_CHANNEL,
+                encode_invalidation(token, add.cache.namespace, None),
+            )
+            wait_for(lambda: not add.cache.near_cache)
+        self.assertEqual(3, call_mock.call_count)
+        thread.stop()
+        listener.pid = pid
+
+    def test_cache_clear_by_batches(self):
+        @json_cache(strict=True)
+        def add(a: int, b: int = 2) -> int:
+            return a + b
+
+        with patch.object(add.cache, "clear_batch_size", 2):
+            for a in range(10):
+                add(a, b=a % 2)
+            self.assertEqual(5, add.cache_clear(b=0))
+            self.assertEqual(
+                5, self.config.cache_redis_client.scard(add.cache.namespace)
+            )
+            self.assertEqual(5, add.cache_clear())
+        self.assertFalse(self.config.cache_redis_client.exists(add.cache.namespace))
+
     def test_strict_cache_function(self):
         call_mock = Mock()
 
@@ -292,6 +609,203 @@ class JsonCacheTestCase(CacheTestCase):
         self.assertEqual(unexpired_add(1), 3)
         self.assertEqual(unexpired_add_call_mock.call_count, 1)
 
+    def test_single_flight(self):
+        call_mock = Mock()
+
+        @json_cache(single_flight=True, lock_wait=1)
+        def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        self.assertEqual(3, add(1))
+        self.assertEqual(1, call_mock.call_count)
+        _, _, cache_key = add.cache.make_key(args=(1,), kwargs={})
+        self.assertFalse(self.config.cache_redis_client.exists(f"{cache_key}-lock"))
+
+        # another process is computing the key, wait for its result
+        _, _, cache_key = add.cache.make_key(args=(2,), kwargs={})
+        self.config.cache_redis_client.set(f"{cache_key}-lock", b"other")
+        results = []
+        thread = threading.Thread(target=lambda: results.append(add(2)))
+        thread.start()
+        time.sleep(0.2)
+        add.cache.set(cache_key, 5)
+        thread.join()
+        self.assertEqual([5], results)
+        self.assertEqual(1, call_mock.call_count)
+
+        # the lock holder never fills the key, compute it after waiting
+        _, _, cache_key = add.cache.make_key(args=(3,), kwargs={})
+        self.config.cache_redis_client.set(f"{cache_key}-lock", b"other")
+        self.assertEqual(5, add(3))
+        self.assertEqual(2, call_mock.call_count)
+        self.assertEqual(
+            b"other", self.config.cache_redis_client.get(f"{cache_key}-lock")
+        )
+
+        # the previous lock holder filled the key right before the lock was acquired
+        _, _, cache_key = add.cache.make_key(args=(4,), kwargs={})
+        self.config.cache_redis_client.set(cache_key, b"7")
+        self.assertEqual(7, add.cache.get_single_flight(cache_key, (4,), {}))
+        self.assertEqual(2, call_mock.call_count)
+        self.assertFalse(self.config.cache_redis_client.exists(f"{cache_key}-lock"))
+
+    def test_cache_get_many(self):
+        call_mock = Mock()
+
+        @json_cache(limit=3)
+        def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        self.assertEqual(3, add(1))
+        calls = [((1,), {}), ((2,), {"b": 3}), ((2,), {"b": 3}), ((3,), {})]
+        self.assertEqual([3, 5, 5, 5], add.cache_get_many(calls))
+        self.assertEqual(3, call_mock.call_count)
+        self.assertEqual(1, add.cache.hits)
+        self.assertEqual(4, add.cache.misses)
+        self.assertEqual([3, 5, 5, 5], add.cache_get_many(calls, max_workers=2))
+        self.assertEqual(3, call_mock.call_count)
+        self.assertEqual(5, add.cache.hits)
+
+        self.assertEqual([6, 7], add.cache_get_many([((4,), {}), ((5,), {})], 2))
+        self.assertEqual(5, call_mock.call_count)
+        self.assertEqual(3, self.config.cache_redis_client.scard(add.cache.namespace))
+        self.assertEqual([], add.cache_get_many([]))
+
+    def test_cache_info(self):
+        @json_cache(limit=2, latency_stats=True)
+        def add(a: int, b: int = 2) -> int:
+            return a + b
+
+        for a in (1, 1, 2, 3):
+            add(a)
+        calls = [((3,), {}), ((5,), {}), ((5,), {"b": 2})]
+        self.assertEqual([5, 7, 7], add.cache_get_many(calls))
+        info = add.cache_info()
+        self.assertEqual((2, 5, 3, 2, 2, 0), info[:6])
+        self.assertEqual(4, info.latencies["lookup"].samples)
+        # the get_many misses are computed without a lookup
+        self.assertEqual(5, info.latencies["compute"].samples)
+        # 4 fetches, 3 set scripts and one fetch_many
+        self.assertEqual(8, info.latencies["io"].samples)
+        # 3 dumps and a load by the calls, a load and 2 dumps by get_many
+        self.assertEqual(7, info.latencies["serialize"].samples)
+
+        @json_cache(limit=2)
+        def sub(a: int, b: int = 2) -> int:
+            return a - b
+
+        sub.cache_get_many([((a,), {}) for a in range(4)])
+        self.assertEqual(2, sub.cache_info().evictions)
+        self.assertEqual({}, sub.cache_info().latencies)
+
+    def test_cache_events(self):
+        received = []
+
+        @json_cache(limit=1, eviction="lru", listeners=[received.append])
+        def add(a: int, b: int = 2) -> int:
+            return a + b
+
+        add(1)
+        add(2)
+        add.cache_get_many([((2,), {}), ((3,), {})])
+        self.assertEqual(1, add.cache_clear())
+        key_1, key_2, key_3 = (add.cache.make_key((a,), {})[2] for a in (1, 2, 3))
+        self.assertEqual(
+            [
+                ("set", key_1),
+                ("miss", key_1),
+                ("evict", key_1),
+                ("set", key_2),
+                ("miss", key_2),
+                ("evict", key_2),
+                ("set", key_3),
+                ("hit", key_2),
+                ("miss", key_3),
+                ("clear", None),
+            ],
+            [(event.name, event.key) for event in received],
+        )
+
+    def test_cache_set_round_trip(self):
+        @json_cache(limit=2)
+        def add(a: int, b: int = 2) -> int:
+            return a + b
+
+        add(1)
+        client = self.config.cache_redis_client
+        with patch.object(
+            client, "execute_command", wraps=client.execute_command
+        ) as execute_command:
+            add.cache.set(add.cache.make_key(args=(2,), kwargs={})[2], 4)
+            add.cache.set(add.cache.make_key(args=(3,), kwargs={})[2], 5)
+        self.assertEqual(2, execute_command.call_count)
+        self.assertEqual("EVALSHA", execute_command.call_args[0][0])
+        self.assertEqual(2, client.scard(add.cache.namespace))
+        self.assertEqual(2, len(client.keys(f"{add.cache.function_hash}:*")))
+
+        @json_cache(limit=-1)
+        def unlimited_add(a: int, b: int = 2) -> int:
+            return a + b
+
+        for a in range(3):
+            self.assertEqual(a + 2, unlimited_add(a))
+        self.assertEqual(3, client.scard(unlimited_add.cache.namespace))
+
+    def test_json_cache_eviction(self):
+        with self.assertRaises(ValueError):
+            json_cache(eviction="fifo")(lambda: ...)
+
+        call_mock = Mock()
+
+        @json_cache(limit=2, eviction="lru")
+        def lru_add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        lru_add(1)
+        time.sleep(0.01)
+        lru_add(2)
+        time.sleep(0.01)
+        lru_add(1)
+        lru_add(3)
+        self.assertEqual(3, call_mock.call_count)
+        lru_add(1)
+        self.assertEqual(3, call_mock.call_count)
+        lru_add(2)
+        self.assertEqual(4, call_mock.call_count)
+        self.assertEqual(
+            2, self.config.cache_redis_client.zcard(lru_add.cache.scores_namespace)
+        )
+
+        call_mock.reset_mock()
+
+        @json_cache(limit=2, eviction="lfu", strict=True)
+        def lfu_add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        lfu_add(1)
+        lfu_add(2)
+        lfu_add(2)
+        lfu_add(2)
+        lfu_add(1)
+        lfu_add(3)
+        self.assertEqual(3, call_mock.call_count)
+        lfu_add(2)
+        self.assertEqual(3, call_mock.call_count)
+        self.assertEqual([4, 5], lfu_add.cache_get_many([((2,), {}), ((3,), {})]))
+        self.assertEqual(3, call_mock.call_count)
+        self.assertEqual(1, lfu_add.cache_clear(a=2))
+        self.assertEqual(
+            1, self.config.cache_redis_client.zcard(lfu_add.cache.scores_namespace)
+        )
+        self.assertEqual(1, lfu_add.cache_clear())
+        self.assertFalse(
+            self.config.cache_redis_client.exists(lfu_add.cache.scores_namespace)
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
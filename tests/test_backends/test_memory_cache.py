@@ -1,7 +1,8 @@
+import threading
 import time
 import unittest
-from typing import Type
-from unittest.mock import Mock
+from typing import Optional, Type
+from unittest.mock import Mock, patch
 
 from configalchemy.utils import import_reference
 
@@ -11,9 +12,12 @@ from cache_alchemy import (
     method_memory_cache,
     property_memory_cache,
 )
-from cache_alchemy.backends.memory import MemoryCache
+from cache_alchemy.backends.memory import CacheItem, MemoryCache
 from cache_alchemy.backends.memory import all_cache_pool
+from cache_alchemy.events import add_listener, remove_listener
+from cache_alchemy.invalidation import INVALIDATION_CHANNEL, encode_invalidation
 from cache_alchemy.lru import LRUDict
+from cache_alchemy.refresh import Refresher
 from cache_alchemy.utils import UnsupportedError
 from tests import CacheTestCase
 
@@ -91,6 +95,54 @@ class MemoryCacheTestCase(CacheTestCase):
         self.assertEqual(add(2), result)
         self.assertEqual(call_mock.call_count, 4)
 
+    def test_coherent_distributed_memory_cache(self):
+        with self.assertRaises(ValueError):
+            memory_cache(stale_ttl=10)(lambda: ...)
+        with self.assertRaises(ValueError):
+            memory_cache(single_flight=True)(lambda: ...)
+
+        call_mock = Mock()
+        client = self.config.cache_redis_client
+
+        with self.assertRaises(ValueError):
+            memory_cache(near_cache_limit=1)(lambda: ...)
+
+        @memory_cache(coherent=True)
+        def add(a: int, b: int = 2) -> int:
+            call_mock()
+            return a + b
+
+        self.assertEqual(3, add(1))
+        with patch.object(client, "get", side_effect=AssertionError):
+            self.assertEqual(3, add(1))
+        self.assertEqual(1, call_mock.call_count)
+
+        # another process recomputes the key
+        key = add.cache.make_key((1,), {})[2]
+        client.publish(
+            INVALIDATION_CHANNEL, encode_invalidation("other", add.cache.namespace, key)
+        )
+        deadline = time.monotonic() + 5
+        while key in add.cache.cache_pool and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(3, add(1))
+        self.assertEqual(2, call_mock.call_count)
+
+        self.assertEqual(1, add.cache_clear())
+        self.assertFalse(add.cache.cache_pool)
+        self.assertEqual(3, add(1))
+        self.assertEqual(3, call_mock.call_count)
+
+        # another process recomputes the key while this one computes it
+        add.cache.invalidate()
+        call_mock.side_effect = lambda: add.cache.invalidate(key)
+        self.assertEqual(3, add(1))
+        self.assertNotIn(key, add.cache.cache_pool)
+        call_mock.side_effect = None
+        self.assertEqual(3, add(1))
+        self.assertEqual(5, call_mock.call_count)
+        self.assertIn(key, add.cache.cache_pool)
+
     def test_distributed_strict_memory_cache(self):
         call_mock = Mock()
         result = object()
@@ -209,6 +261,69 @@ class MemoryCacheTestCase(CacheTestCase):
         add(1)
         self.assertEqual(3, call_mock.call_count)
 
+    def test_memory_cache_argument_index(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        call_mock = Mock()
+
+        with self.assertRaises(ValueError):
+            memory_cache(argument_index=True)(lambda: ...)
+
+        @memory_cache(limit=3, strict=True, argument_index=True)
+        def add(a: int, b: int = 2) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            call_mock()
+            return a + b
+
+        add(1)
+        add(1, b=3)
+        add(2, b=3)
+        self.assertEqual(3, len(add.cache.index))
+        self.assertEqual(1, add.cache_clear(a=1, b=3))
+        self.assertEqual(1, add.cache_clear(b=3))
+        self.assertEqual(0, add.cache_clear(b=3))
+        add(3)
+        add(4)
+        add(5)
+        # the evicted key leaves the index with the cache
+        self.assertEqual(3, len(add.cache.index))
+        self.assertEqual(0, add.cache_clear(a=1))
+        self.assertEqual(6, call_mock.call_count)
+        self.assertEqual(1, add.cache_clear(a=3))
+        add(4)
+        self.assertEqual(6, call_mock.call_count)
+        self.assertEqual(2, add.cache_clear())
+        self.assertEqual(0, len(add.cache.index))
+
+    def test_memory_cache_tuple_key(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        call_mock = Mock()
+
+        with self.assertRaises(ValueError):
+            memory_cache(strict=True, tuple_key=True)(lambda: ...)
+
+        @memory_cache(tuple_key=True)
+        def add(a, b=2) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            call_mock()
+            return len(a) + b
+
+        self.assertEqual(4, add("ab"))
+        self.assertEqual(4, add("ab"))
+        self.assertEqual(5, add("ab", b=3))
+        self.assertEqual(3, add(["a"]))
+        self.assertEqual(3, add(["a"]))
+        # the repr of the unhashable list is not mistaken for a string argument
+        self.assertEqual(10, add("(['a'],)"))
+        self.assertEqual(4, call_mock.call_count)
+        self.assertIn(("ab",), add.cache.cache_pool)
+        self.assertEqual(4, add.cache_clear())
+
     def test_distributed_strict_memory_cache_clear_with_pattern(self):
         call_mock = Mock()
         result = object()
@@ -242,6 +357,345 @@ class MemoryCacheTestCase(CacheTestCase):
         self.assertEqual(add(1), 3)
         self.assertEqual(call_mock.call_count, 2)
 
+    def test_memory_cache_eviction(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        call_mock = Mock()
+
+        with self.assertRaises(ValueError):
+            memory_cache(eviction="random")(lambda: ...)
+
+        @memory_cache(limit=2, eviction="lfu", strict=True, argument_index=True)
+        def add(a: int, b: int = 2) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            call_mock()
+            return a + b
+
+        add(1)
+        add(1)
+        add(2)
+        add(3)
+        self.assertEqual(3, call_mock.call_count)
+        add(1)
+        self.assertEqual(3, call_mock.call_count)
+        # the evicted key leaves the index with the cache
+        self.assertEqual(2, len(add.cache.index))
+
+    def test_memory_cache_max_bytes(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        call_mock = Mock()
+
+        with self.assertRaises(ValueError):
+            memory_cache(max_bytes=100, eviction="lfu")(lambda: ...)
+
+        @memory_cache(limit=-1, max_bytes=100, weigher=len)
+        def repeat(size: int) -> bytes:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            call_mock()
+            return b"x" * size
+
+        for size in (40, 40, 30, 1000):
+            repeat(size)
+        self.assertEqual(70, repeat.cache.weight)
+        repeat(40)
+        repeat(60)
+        # 30 is the least recently used
+        self.assertEqual(4, call_mock.call_count)
+        self.assertEqual(100, repeat.cache.weight)
+        self.assertEqual(2, repeat.cache_clear())
+        self.assertEqual(0, repeat.cache.weight)
+
+    def test_memory_cache_info(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+
+        @memory_cache(limit=2, latency_stats=True)
+        def add(a: int, b: int = 2) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            return a + b
+
+        self.assertEqual(2, add.cache.cached_function.__defaults__[0])
+        for a in (1, 1, 2, 3, 1):
+            add(a)
+        info = add.cache_info()
+        self.assertEqual((1, 4, 2, 2, 2), info[:5])
+        self.assertEqual(5, info.latencies["lookup"].samples)
+        self.assertEqual(4, info.latencies["compute"].samples)
+        self.assertEqual(0, info.latencies["io"].samples)
+
+        def lookup():
+            for a in range(1000):
+                add(a % 4)
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = add.cache_info()
+        self.assertEqual(8005, info.hits + info.misses)
+        self.assertEqual(8005, info.latencies["lookup"].samples)
+        self.assertEqual(2, add.cache_clear())
+        self.assertEqual((0, 0, 0, 0), add.cache_info()[:4])
+
+        @memory_cache(limit=-1)
+        def unlimited_add(a: int, b: int = 2) -> int:
+            return a + b
+
+        unlimited_add(1)
+        self.assertEqual({}, unlimited_add.cache_info().latencies)
+        self.assertEqual(1, unlimited_add.cache_info().size)
+
+    def test_memory_cache_events(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        received = []
+
+        @memory_cache(limit=1, listeners=[received.append])
+        def add(a: int, b: int = 2) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            return a + b
+
+        add(1)
+        add(1)
+        add(2)
+        self.assertEqual(1, add.cache_clear())
+        key_1, key_2 = (add.cache.make_key((a,), {})[2] for a in (1, 2))
+        self.assertEqual(
+            [
+                ("set", key_1),
+                ("miss", key_1),
+                ("hit", key_1),
+                ("evict", key_1),
+                ("set", key_2),
+                ("miss", key_2),
+                ("clear", None),
+            ],
+            [(event.name, event.key) for event in received],
+        )
+        self.assertEqual({add.cache.namespace}, {event.namespace for event in received})
+        self.assertTrue(all(event.duration >= 0 for event in received))
+        self.assertEqual(1, received[-1].items)
+
+        @memory_cache(limit=1)
+        def sub(a: int, b: int = 2) -> int:
+            return a - b
+
+        global_received = []
+        sub(1)
+        add_listener(global_received.append)
+        try:
+            sub(1)
+        finally:
+            remove_listener(global_received.append)
+        sub(1)
+        self.assertEqual(["hit"], [event.name for event in global_received])
+
+    def test_memory_cache_stale_ttl(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        call_mock = Mock()
+
+        with self.assertRaises(ValueError):
+            memory_cache(stale_ttl=-1)(lambda: ...)
+
+        @memory_cache(expire=10, stale_ttl=10)
+        def count(a: int) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            call_mock()
+            return call_mock.call_count
+
+        count.cache.refresher = Refresher(max_workers=1)
+        now = count.cache.get_timestamp()
+        with patch.object(count.cache, "get_timestamp", return_value=now):
+            self.assertEqual(1, count(1))
+        with patch.object(count.cache, "get_timestamp", return_value=now + 15):
+            # served stale while refreshed in the background
+            self.assertEqual(1, count(1))
+            self.assertEqual(0, count.cache.reclaim_expired())
+            count.cache.refresher.executor.shutdown(wait=True)
+        self.assertEqual(2, count(1))
+        with patch.object(count.cache, "get_timestamp", return_value=now + 100):
+            self.assertEqual(3, count(1))
+
+    def test_memory_cache_negative_ttl(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        call_mock = Mock()
+
+        for kwargs in ({"negative_ttl": 0}, {"negative_exceptions": (KeyError,)}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                memory_cache(**kwargs)(lambda: ...)
+
+        @memory_cache(expire=100, negative_ttl=10, negative_exceptions=(LookupError,))
+        def find(name: str) -> Optional[str]:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            call_mock()
+            if name == "missing":
+                raise KeyError(name)
+            if name == "error":
+                raise ValueError(name)
+            return name if name else None
+
+        now = find.cache.get_timestamp()
+        with patch.object(find.cache, "get_timestamp", return_value=now):
+            for _ in range(2):
+                self.assertIsNone(find(""))
+                self.assertEqual("a", find("a"))
+                with self.assertRaises(KeyError):
+                    find("missing")
+                with self.assertRaises(ValueError):
+                    find("error")
+            self.assertEqual(5, call_mock.call_count)
+        with patch.object(find.cache, "get_timestamp", return_value=now + 11):
+            self.assertIsNone(find(""))
+            self.assertEqual("a", find("a"))
+            with self.assertRaises(KeyError):
+                find("missing")
+            self.assertEqual(7, call_mock.call_count)
+
+    def test_memory_cache_active_expiration(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+
+        @memory_cache(expire=10, limit=-1, strict=True, argument_index=True)
+        def add(a: int, b: int = 2) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            return a + b
+
+        now = add.cache.get_timestamp()
+        with patch.object(add.cache, "get_timestamp", return_value=now):
+            for a in range(100):
+                add(a)
+        with patch.object(add.cache, "get_timestamp", return_value=now + 5):
+            add(0)
+            self.assertEqual(100, len(add.cache.cache_pool))
+            add.cache_clear(a=1)
+            add(1)
+        with patch.object(add.cache, "get_timestamp", return_value=now + 11):
+            # a read reclaims a batch of the expired items
+            add(1)
+            self.assertEqual(
+                100 - add.cache.expire_batch + 1, len(add.cache.cache_pool)
+            )
+            self.assertEqual(100 - add.cache.expire_batch, add.cache.reclaim_expired())
+            self.assertEqual(1, len(add.cache.cache_pool))
+            self.assertEqual(1, len(add.cache.index))
+            self.assertEqual(0, add.cache.reclaim_expired())
+        with patch.object(add.cache, "get_timestamp", return_value=now + 16):
+            self.assertEqual(1, add.cache.reclaim_expired())
+            self.assertEqual(0, len(add.cache.deadlines))
+
+        # an item set again while the expired one is reclaimed is kept
+        with patch.object(add.cache, "get_timestamp", return_value=now):
+            add(2)
+        key = add.cache.make_key((2,), {})[2]
+        peek = add.cache.peek
+
+        def set_again(key):
+            item = peek(key)
+            add.cache.store(key, CacheItem(timestamp=now + 100, value=5))
+            return item
+
+        with patch.object(add.cache, "peek", side_effect=set_again):
+            self.assertEqual(0, add.cache.reclaim_expired(now + 20))
+        self.assertEqual(5, add.cache.cache_pool[key].value)
+
+        @memory_cache(expire=3600, limit=10, eviction="lfu")
+        def bounded(a: int) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            return a
+
+        for a in range(1000):
+            bounded(a)
+        self.assertEqual(10, len(bounded.cache.cache_pool))
+        # the deadlines of the evicted keys are compacted away
+        self.assertGreaterEqual(
+            20 + bounded.cache.expire_batch, len(bounded.cache.deadlines)
+        )
+        # a stale deadline of a live key is checked without counting an access
+        key = next(iter(bounded.cache.cache_pool))
+        bounded.cache.deadlines.insert(0, (now, -1, key))
+        self.assertEqual(0, bounded.cache.reclaim_expired(now + 1))
+        self.assertEqual(1, bounded.cache.cache_pool.counts[key])
+
+        @memory_cache(expire=-1)
+        def never_expire(a: int) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            return a
+
+        self.assertEqual(1, never_expire(1))
+        self.assertEqual(1, never_expire(1))
+        self.assertEqual(1, never_expire.cache.misses)
+        self.assertEqual(0, len(never_expire.cache.deadlines))
+
+    def test_memory_cache_single_flight(self):
+        class TestMemoryCacheConfig(DefaultConfig):
+            CACHE_ALCHEMY_MEMORY_BACKEND = "cache_alchemy.backends.memory.MemoryCache"
+
+        config = TestMemoryCacheConfig()
+        call_mock = Mock()
+        event = threading.Event()
+
+        @memory_cache(single_flight=True)
+        def add(a: int, b: int = 2) -> int:
+            self.assertEqual(config, DefaultConfig.get_current_config())
+            call_mock()
+            event.wait()
+            if a < 0:
+                raise ValueError(a)
+            return a + b
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(add(1))) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        event.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([3] * 5, results)
+        self.assertEqual(1, call_mock.call_count)
+        self.assertEqual(0, len(add.cache.in_flight))
+
+        event.clear()
+        errors = []
+
+        def call():
+            try:
+                add(-1)
+            except ValueError as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        event.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(3, len(errors))
+        self.assertEqual(1, len(set(map(id, errors))))
+        self.assertEqual(2, call_mock.call_count)
+        self.assertEqual(0, len(add.cache.in_flight))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,4 @@
+import sys
 import unittest
 from unittest.mock import Mock
 
@@ -40,6 +41,82 @@ class PickleCacheTestCase(CacheTestCase):
         self.assertEqual(1, hello.cache.hits)
         self.assertEqual(2, hello.cache_clear())
 
+    def test_cache_compression(self):
+        call_mock = Mock()
+        client = self.config.cache_redis_client
+
+        with self.assertRaises(ValueError):
+            pickle_cache(compression="unknown")(lambda: ...)
+
+        @pickle_cache(compression="zlib", compression_level=9)
+        def hello(name: str, size: int) -> TestObject:
+            call_mock()
+            return TestObject(name=name * size)
+
+        self.assertEqual(TestObject(name="world" * 1000), hello("world", 1000))
+        self.assertEqual(TestObject(name="world"), hello("world", 1))
+        self.assertEqual(TestObject(name="world" * 1000), hello("world", 1000))
+        self.assertEqual(2, call_mock.call_count)
+        large, small = (
+            client.get(hello.cache.make_key(("world", size), {})[2])
+            for size in (1000, 1)
+        )
+        self.assertEqual(b"\x00\x01", large[:2])
+        self.assertLess(len(large), 1000)
+        self.assertEqual(b"\x80", small[:1])
+
+        # values written with another compression, or none, are still read back
+        hello.cache.compressor = None
+        self.assertEqual(TestObject(name="world" * 1000), hello("world", 1000))
+        self.assertEqual(2, call_mock.call_count)
+
+    def test_cache_codecs(self):
+        client = self.config.cache_redis_client
+
+        @pickle_cache
+        def echo(value):
+            return value
+
+        for tag, value in ((b"\x02", b"bytes"), (b"\x03", "str"), (b"\x04", 1)):
+            with self.subTest(value=value):
+                self.assertEqual(value, echo(value))
+                self.assertEqual(value, echo(value))
+                stored = client.get(echo.cache.make_key((value,), {})[2])
+                self.assertEqual(tag, stored[:1])
+
+    def test_cache_out_of_band(self):
+        if sys.version_info < (3, 8):
+            with self.assertRaises(ValueError):
+                pickle_cache(out_of_band=True)(lambda value: value)
+            return
+        client = self.config.cache_redis_client
+
+        @pickle_cache(out_of_band=True)
+        def echo(value):
+            return value
+
+        value = bytearray(b"data" * 1024)
+        self.assertEqual(value, echo(value))
+        self.assertEqual(value, echo(value))
+        stored = client.get(echo.cache.make_key((value,), {})[2])
+        self.assertEqual(b"\x06", stored[:1])
+
+    def test_cache_negative_near_cache(self):
+        call_mock = Mock()
+
+        @pickle_cache(
+            near_cache_limit=10, negative_ttl=5, negative_exceptions=(KeyError,)
+        )
+        def find(name: str) -> str:
+            call_mock()
+            raise KeyError(name)
+
+        for _ in range(3):
+            with self.assertRaises(KeyError):
+                find("missing")
+        self.assertEqual(1, call_mock.call_count)
+        self.assertEqual(0, len(find.cache.near_cache))
+
     def test_cache_method(self):
         call_mock = Mock()
 
@@ -0,0 +1,80 @@
+import pickle
+import sys
+import unittest
+from collections import OrderedDict
+from decimal import Decimal
+
+from cache_alchemy.codecs import (
+    codecs,
+    codecs_by_tag,
+    codecs_by_type,
+    decode,
+    encode,
+    out_of_band_codec,
+    register_codec,
+)
+
+
+class CodecsTestCase(unittest.TestCase):
+    def test_encode(self):
+        test_data = [
+            (b"\x02", b"\x80bytes"),
+            (b"\x03", "str"),
+            (b"\x04", -(10**30)),
+            (b"\x05", {"a": [1, 2.5, (None, True)], "b": {b"c"}}),
+            (b"\x80", True.__class__.mro()),
+            (b"\x80", [OrderedDict(a=1)]),
+            (b"\x80", Decimal("1.1")),
+        ]
+        for tag, value in test_data:
+            with self.subTest(tag=tag, value=value):
+                data = encode(value)
+                self.assertEqual(tag, data[:1])
+                self.assertEqual(value, decode(data))
+                self.assertIs(type(value), type(decode(data)))
+        # marshal stores buffers as bytes
+        self.assertEqual(b"\x80", encode([bytearray(b"data")])[:1])
+        # values stored by plain pickle are still read back
+        self.assertEqual([1], decode(pickle.dumps([1])))
+        with self.assertRaises(ValueError):
+            decode(b"\xffvalue")
+
+    @unittest.skipIf(sys.version_info < (3, 8), "pickle protocol 5 requires Python 3.8")
+    def test_out_of_band(self):
+        test_data = [
+            (b"\x06", bytearray(b"data" * 1024)),
+            (b"\x06", [pickle.PickleBuffer(b"data"), pickle.PickleBuffer(b"")]),
+            (b"\x80", [OrderedDict(a=bytearray(b"data"))]),
+            (b"\x05", [1]),
+        ]
+        for tag, value in test_data:
+            with self.subTest(tag=tag, value=value):
+                data = encode(value, out_of_band_codec)
+                self.assertEqual(tag, data[:1])
+                self.assertEqual(value, decode(data))
+                self.assertIs(type(value), type(decode(data)))
+        # buffers are viewed in the stored data
+        data = encode(pickle.PickleBuffer(b"data"), out_of_band_codec)
+        self.assertIs(data, decode(data).obj)
+
+    def test_register_codec(self):
+        for tag in (0x00, 0x80, 0x02, 256):
+            with self.subTest(tag=tag), self.assertRaises(ValueError):
+                register_codec("decimal", tag, (Decimal,), str.encode, str)
+
+        codec = register_codec(
+            "decimal",
+            0xFF,
+            (Decimal,),
+            lambda value: str(value).encode(),
+            lambda data: Decimal(str(data, "ascii")),
+        )
+        try:
+            self.assertEqual(b"\xff1.1", encode(Decimal("1.1")))
+            self.assertEqual(Decimal("1.1"), decode(b"\xff1.1"))
+        finally:
+            del codecs[codec.name], codecs_by_tag[codec.tag], codecs_by_type[Decimal]
+
+
+if __name__ == "__main__":
+    unittest.main()
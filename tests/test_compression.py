@@ -0,0 +1,46 @@
+import unittest
+
+from cache_alchemy.compression import (
+    compress,
+    compressors,
+    compressors_by_tag,
+    decompress,
+    get_compressor,
+    register_compressor,
+)
+
+
+class CompressionTestCase(unittest.TestCase):
+    def test_compress(self):
+        data = b"cache" * 1000
+        for name in ("zlib", "lzma"):
+            with self.subTest(name=name):
+                compressed = compress(data, get_compressor(name), 1)
+                self.assertEqual(b"\x00" + get_compressor(name).tag, compressed[:2])
+                self.assertLess(len(compressed), len(data))
+                self.assertEqual(data, decompress(compressed))
+        # data which does not shrink is kept as is
+        self.assertEqual(b"cache", compress(b"cache", get_compressor("zlib")))
+        self.assertEqual(b"cache", decompress(b"cache"))
+        with self.assertRaises(ValueError):
+            decompress(b"\x00\xffcache")
+        with self.assertRaises(ValueError):
+            get_compressor("unknown")
+
+    def test_register_compressor(self):
+        with self.assertRaises(ValueError):
+            register_compressor("reverse", 256, lambda d, l: d, bytes)
+        with self.assertRaises(ValueError):
+            register_compressor("reverse", 1, lambda d, l: d, bytes)
+        compressor = register_compressor(
+            "truncate", 255, lambda data, level: data[:1], lambda data: b"cache" * 10
+        )
+        try:
+            self.assertEqual(b"\x00\xffc", compress(b"cache" * 10, compressor))
+            self.assertEqual(b"cache" * 10, decompress(b"\x00\xffc"))
+        finally:
+            del compressors["truncate"], compressors_by_tag[compressor.tag]
+
+
+if __name__ == "__main__":
+    unittest.main()
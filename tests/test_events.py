@@ -0,0 +1,29 @@
+import unittest
+
+from cache_alchemy import events
+from cache_alchemy.events import CacheEvent, add_listener, notify, remove_listener
+
+
+class EventsTestCase(unittest.TestCase):
+    def test_notify(self):
+        received = []
+
+        def failing_listener(event: CacheEvent) -> None:
+            raise RuntimeError(event.name)
+
+        event = CacheEvent("hit", "namespace", "key", 0.1)
+        add_listener(received.append)
+        try:
+            with self.assertLogs(events.logger, "ERROR"):
+                notify([failing_listener, received.append], event)
+        finally:
+            remove_listener(received.append)
+        self.assertEqual([event, event], received)
+        self.assertEqual([], events.listeners)
+        notify([], event)
+        self.assertEqual(2, len(received))
+        self.assertEqual(1, event.items)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import random
+import unittest
+
+from cache_alchemy.eviction import (
+    ARCDict,
+    ClockDict,
+    FIFODict,
+    LFUDict,
+    TinyLFUDict,
+    eviction_dicts,
+    get_eviction_dict,
+)
+
+
+class EvictionTestCase(unittest.TestCase):
+    def test_eviction_dicts(self):
+        with self.assertRaises(ValueError):
+            get_eviction_dict("random")
+        rng = random.Random(0)
+        for name, eviction_dict in eviction_dicts.items():
+            with self.subTest(eviction=name):
+                with self.assertRaises(ValueError):
+                    eviction_dict(0)
+                evicted = []
+                cache = eviction_dict(
+                    10, on_evict=lambda key, value: evicted.append((key, value))
+                )
+                alive = {}
+                for _ in range(2000):
+                    key = int(rng.paretovariate(1)) % 50
+                    operation = rng.random()
+                    if operation < 0.6:
+                        if cache.get(key) is not None:
+                            self.assertEqual(alive[key], cache[key])
+                    elif operation < 0.9:
+                        cache[key] = alive[key] = rng.random()
+                    else:
+                        self.assertEqual(alive.pop(key, None), cache.pop(key, None))
+                    for key, value in evicted:
+                        self.assertEqual(alive.pop(key), value)
+                    evicted.clear()
+                    self.assertLessEqual(len(cache), 10)
+                    self.assertEqual(set(alive), set(cache))
+                del cache[next(iter(alive))]
+                cache.clear()
+                self.assertEqual(0, len(cache))
+                for key in range(20):
+                    cache[key] = key
+                self.assertEqual(10, len(cache))
+
+    def test_small_sizes(self):
+        for name, eviction_dict in eviction_dicts.items():
+            for size in (1, 2):
+                with self.subTest(eviction=name, size=size):
+                    cache = eviction_dict(size)
+                    for key in (1, 2, 1, 3, 3, 2, 4):
+                        if cache.get(key) is None:
+                            cache[key] = key
+                        self.assertLessEqual(len(cache), size)
+                        self.assertIn(key, cache)
+
+    def test_remove(self):
+        for name, eviction_dict in eviction_dicts.items():
+            with self.subTest(eviction=name):
+                cache = eviction_dict(2)
+                value = object()
+                cache[1] = value
+                self.assertFalse(cache.remove(1, object()))
+                self.assertFalse(cache.remove(2, value))
+                self.assertTrue(cache.remove(1, value))
+                self.assertNotIn(1, cache)
+                cache[2] = 2
+                cache[3] = 3
+                self.assertEqual([2, 3], sorted(cache))
+
+    def test_fifo_and_lfu(self):
+        fifo, lfu = FIFODict(2), LFUDict(2)
+        for cache in (fifo, lfu):
+            cache[1] = 1
+            cache[2] = 2
+            cache[1]
+            cache[1]
+            cache[3] = 3
+        self.assertEqual([2, 3], sorted(fifo))
+        self.assertEqual([1, 3], sorted(lfu))
+
+    def test_clock(self):
+        cache = ClockDict(2)
+        cache[1] = 1
+        cache[2] = 2
+        cache[1]
+        # the hand gives 1 a second chance
+        cache[3] = 3
+        self.assertEqual([1, 3], sorted(cache))
+
+    def test_scan_resistance(self):
+        for eviction_dict in (ARCDict, TinyLFUDict):
+            with self.subTest(eviction=eviction_dict.__name__):
+                cache = eviction_dict(100)
+                hot = range(50)
+                for _ in range(5):
+                    for key in hot:
+                        if cache.get(key) is None:
+                            cache[key] = key
+                for key in range(1000, 2000):
+                    cache[key] = key
+                hits = sum(cache.get(key) is not None for key in hot)
+                self.assertGreater(hits, 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
+import logging
+import sys
 import unittest
 
 from cache_alchemy import LRUDict
-from cache_alchemy.lru import DoublyLinkedListNode
+from cache_alchemy.lru import DoublyLinkedListNode, sizeof
 
 
 class LRUTestCase(unittest.TestCase):
@@ -18,6 +20,16 @@ class LRUTestCase(unittest.TestCase):
         lru_dict[3] = 3
         self.assertFalse(1 in lru_dict)
         self.assertEqual(2, lru_dict[2])
+        # peeking keeps 3 the least recently used
+        self.assertEqual(3, lru_dict.peek(3))
+        self.assertIsNone(lru_dict.peek(1))
+        lru_dict[4] = 4
+        self.assertFalse(3 in lru_dict)
+        # removed only if the key still holds the value
+        self.assertFalse(lru_dict.remove(4, 3))
+        self.assertTrue(lru_dict.remove(4, 4))
+        self.assertEqual([2], list(lru_dict))
+        self.assertEqual(1, len(lru_dict.root))
 
     def test_lru_dict(self):
         lru_dict = LRUDict(5)
@@ -37,6 +49,78 @@ class LRUTestCase(unittest.TestCase):
         lru_dict.clear()
         self.assertEqual(0, len(lru_dict.root))
 
+    def test_lru_dict_delete_and_evict(self):
+        evicted = []
+        lru_dict = LRUDict(2, on_evict=lambda key, value: evicted.append(key))
+        lru_dict[1] = 1
+        lru_dict[2] = 2
+        del lru_dict[1]
+        self.assertEqual(2, lru_dict.pop(2))
+        self.assertIsNone(lru_dict.pop(2, None))
+        self.assertEqual(0, len(lru_dict.root))
+        for index in range(3):
+            lru_dict[index] = index
+        self.assertEqual([0], evicted)
+        self.assertEqual({1, 2}, set(lru_dict))
+        lru_dict[1] = "refreshed"
+        lru_dict[3] = 3
+        self.assertEqual("refreshed", lru_dict[1])
+        self.assertEqual([0, 2], evicted)
+
+    def test_lru_dict_weight(self):
+        with self.assertRaises(ValueError):
+            LRUDict(2, max_weight=10)
+        evicted = []
+        lru_dict = LRUDict(
+            3,
+            on_evict=lambda key, value: evicted.append(key),
+            weigher=len,
+            max_weight=10,
+        )
+        lru_dict[1] = "aaaa"
+        lru_dict[2] = "bbbb"
+        self.assertEqual(8, lru_dict.weight)
+        lru_dict[1]
+        lru_dict[3] = "cccc"
+        self.assertEqual([2], evicted)
+        self.assertEqual(8, lru_dict.weight)
+        lru_dict[1] = "a"
+        lru_dict[4] = "d"
+        lru_dict[5] = "e"
+        # the count limit still holds
+        self.assertEqual([2, 3], evicted)
+        self.assertEqual(3, lru_dict.weight)
+        # too heavy to ever fit, the other values are kept
+        lru_dict[4] = "d" * 11
+        self.assertEqual([2, 3, 4], evicted)
+        self.assertEqual({1, 5}, set(lru_dict))
+        self.assertEqual(2, lru_dict.weight)
+        self.assertEqual("e", lru_dict.pop(5))
+        self.assertEqual(1, lru_dict.weight)
+        lru_dict.clear()
+        self.assertEqual(0, lru_dict.weight)
+
+    def test_sizeof(self):
+        class Value:
+            def __init__(self, data):
+                self.data = data
+
+        data = b"x" * 10000
+        self.assertGreater(sizeof([data]), 10000)
+        self.assertGreater(sizeof({"data": Value(data)}), 10000)
+        self.assertLess(sizeof([data, data]), 20000)
+        recursive = []
+        recursive.append(recursive)
+        self.assertLess(sizeof(recursive), 1000)
+
+        class Service:
+            def __init__(self):
+                self.logger = logging.getLogger(__name__)
+                self.module = sys
+
+        # the module and the logger are not followed
+        self.assertLess(sizeof(Service()), 1000)
+
     def test_double_link(self):
         root = DoublyLinkedListNode()
         last = root.prev
@@ -0,0 +1,44 @@
+import threading
+import unittest
+
+from cache_alchemy.refresh import Refresher
+
+
+class RefresherTestCase(unittest.TestCase):
+    def test_refresher(self):
+        refresher = Refresher(max_workers=1, max_pending=2)
+        event = threading.Event()
+        calls = []
+
+        def refresh(key):
+            event.wait()
+            calls.append(key)
+
+        self.assertTrue(refresher.submit("a", refresh, "a"))
+        # already pending
+        self.assertFalse(refresher.submit("a", refresh, "a"))
+        self.assertTrue(refresher.submit("b", refresh, "b"))
+        # the pool is full
+        self.assertFalse(refresher.submit("c", refresh, "c"))
+        self.assertEqual(2, len(refresher))
+        event.set()
+        refresher.executor.shutdown(wait=True)
+        self.assertEqual(["a", "b"], calls)
+        self.assertEqual(0, len(refresher))
+        self.assertFalse(refresher.submit("a", refresh, "a"))
+        self.assertEqual(0, len(refresher))
+
+    def test_refresh_failure(self):
+        refresher = Refresher(max_workers=1)
+
+        def refresh():
+            raise ValueError
+
+        with self.assertLogs("cache_alchemy.refresh"):
+            refresher.submit("a", refresh)
+            refresher.executor.shutdown(wait=True)
+        self.assertEqual(0, len(refresher))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import math
+import threading
+import unittest
+
+from cache_alchemy.stats import CacheStats, Histogram, LATENCY_NAMES
+
+
+class StatsTestCase(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertEqual(0, histogram.snapshot().samples)
+        self.assertEqual(0.0, histogram.snapshot().p99)
+        for _ in range(98):
+            histogram.record(0.000003)
+        histogram.record(0.0001)
+        histogram.record(100_000)
+        latency = histogram.snapshot()
+        self.assertEqual(100, latency.samples)
+        self.assertGreater(latency.total, 100_000)
+        # 3 microseconds fall in the bucket of [2, 4)
+        self.assertEqual(0.000004, latency.p50)
+        self.assertEqual(0.000128, latency.p99)
+        self.assertEqual(
+            ((0.000004, 98), (0.000128, 1), (math.inf, 1)),
+            latency.buckets,
+        )
+        histogram.reset()
+        self.assertEqual(0, histogram.snapshot().samples)
+
+    def test_cache_stats(self):
+        stats = CacheStats()
+        self.assertEqual({}, stats.info(0, -1, 0).latencies)
+
+        def lookup():
+            for index in range(1000):
+                stats.lookup()
+                if index % 4 == 0:
+                    stats.miss()
+                    stats.evict()
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = stats.info(size=10, limit=10, weight=0)
+        self.assertEqual((6000, 2000, 2000), (info.hits, info.misses, info.evictions))
+        stats.lookup(10, 3)
+        self.assertEqual((6007, 2003), (stats.hits, stats.misses))
+        stats.reset()
+        self.assertEqual(0, stats.info(0, -1, 0).hits)
+
+    def test_timed(self):
+        stats = CacheStats(latency=True)
+        self.assertEqual(set(LATENCY_NAMES), set(stats.info(0, -1, 0).latencies))
+
+        def add(a: int, b: int = 2) -> int:
+            return a + b
+
+        timed_add = stats.timed_function("compute", add)
+        self.assertEqual(3, timed_add(1))
+        self.assertEqual(add.__defaults__, timed_add.__defaults__)
+        self.assertEqual(add.__qualname__, timed_add.__qualname__)
+        self.assertEqual(add.__module__, timed_add.__module__)
+        with self.assertRaises(TypeError):
+            timed_add()
+        self.assertEqual(2, stats.info(0, -1, 0).latencies["compute"].samples)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,7 +8,12 @@ from cache_alchemy.utils import (
     generate_strict_key_pattern,
     UnsupportedError,
     generate_fast_key_pattern,
+    generate_strict_key_glob,
+    generate_fast_key_glob,
+    make_strict_key_builder,
+    make_fast_key_builder,
     escape,
+    escape_glob,
 )
 
 
@@ -84,6 +89,15 @@ class UtilsTestCase(unittest.TestCase):
         ]
         for excepted_key, data in test_data:
             with self.subTest(excepted_key=excepted_key, data=data):
+                build_key = make_strict_key_builder(
+                    data["func"], data.get("is_method", False), "prefix:"
+                )
+                keyword_args, kwargs, key = build_key(data["args"], dict(data["kwargs"]))
+                self.assertEqual(f"prefix:{excepted_key}", key)
+                self.assertEqual(
+                    generate_strict_key(**{**data, "kwargs": dict(data["kwargs"])}),
+                    (keyword_args, kwargs, excepted_key),
+                )
                 self.assertEqual(excepted_key, generate_strict_key(**data)[2])
 
     def test_generate_strict_key_pattern(self):
@@ -243,6 +257,24 @@ class UtilsTestCase(unittest.TestCase):
                 for key in miss_keys:
                     self.assertFalse(bool(pattern.match(key)))
 
+    def test_generate_strict_key_glob(self):
+        test_data: List[Tuple[str, dict]] = [
+            ("*", dict(args=(), kwargs=dict(), func=lambda *a: ...)),
+            ("a1b*", dict(args=(1,), kwargs=dict(), func=lambda a, b=1: ...)),
+            ("a*b2", dict(args=(), kwargs=dict(b=2), func=lambda a, *, b=1: ...)),
+            (
+                "a'\\*\\?\\[\\]\\\\\\\\'b*",
+                dict(args=("*?[]\\",), kwargs=dict(), func=lambda a, b=1: ...),
+            ),
+            ("a'1'b2*", dict(args=(), kwargs=dict(a="1", b=2), func=lambda **k: ...)),
+        ]
+        for excepted_glob, data in test_data:
+            with self.subTest(excepted_glob=excepted_glob, data=data):
+                self.assertEqual(excepted_glob, generate_strict_key_glob(**data))
+        self.assertEqual("a\\*b", escape_glob("a*b"))
+        with self.assertRaises(UnsupportedError):
+            generate_fast_key_glob(args=(), kwargs=dict(), func=lambda: None)
+
     def test_generate_fast_key(self):
         class Tmp:
             @classmethod
@@ -311,6 +343,13 @@ class UtilsTestCase(unittest.TestCase):
         for excepted_key, data in test_data:
             with self.subTest(excepted_key=excepted_key, data=data):
                 self.assertEqual(excepted_key, generate_fast_key(**data)[2])
+                build_key = make_fast_key_builder(
+                    data["func"], data.get("is_method", False), "prefix:"
+                )
+                self.assertEqual(
+                    f"prefix:{excepted_key}",
+                    build_key(data["args"], data["kwargs"])[2],
+                )
 
     def test_generate_fast_key_pattern(self):
         with self.assertRaises(UnsupportedError):